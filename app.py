@@ -6,120 +6,179 @@
 # - Page "Progress": KPIs, equity curve animée (~2s), totaux Weekly/Monthly
 # - On utilise SEULEMENT "result_usd" pour la perf (pas de PnL technique)
 # - Colonne "id" et "strategy" masquées dans l'UI (compatibilité CSV)
+# - Stockage / cache / agrégats / KPIs: package journal_core (sans Streamlit)
+# - Altair n'est importé que sur la page Progress (démarrage plus rapide)
+# - Sidebar ⏱️ Performance: temps par étape de chaque rerun (journal_core/trace.py)
 # -----------------------------------------------------------
 
 import streamlit as st
 import pandas as pd
+import os
 import time
+from collections import deque
 from datetime import datetime, date, time as dtime
-from pathlib import Path
-import altair as alt
+from downsample import lttb_frame, minmax_series
+from journal_core import trace
+from journal_core.analytics import progress_series, risk_metrics, trade_kpis, trade_tickers
+from journal_core.schema import TRADE_CATEGORY_COLUMNS, TRADE_COLUMNS, coerce_daily_schema
+from journal_core.search import search
+from journal_core.snapshots import list_snapshots, reset_journal, restore_snapshot, take_snapshot
+from journal_core.trace import span
+from journal_core.storage import (
+    ConflictError, append_trade, apply_daily_changeset, apply_trade_changeset,
+    DEFAULT_JOURNAL, clear_data_cache, compute_changeset, create_journal, export_csv,
+    list_journals, load_daily, load_trades, query_daily, query_trades, save_daily,
+    save_trades, set_journal, upsert_daily,
+)
+from journal_core.warmup import start_warmup
 
 st.set_page_config(page_title="🗒️ Trading Journal", layout="wide")
+start_warmup()  # Progress précalculée en arrière-plan après chaque écriture
+# Chronométrage du rerun (panneau ⏱️ Performance en bas de la sidebar):
+# désactivé, chaque span ne coûte qu'une lecture de ContextVar
+trace_run = trace.begin(st.session_state.get("trace_on", trace.TRACE_DEFAULT),
+                        sample=st.session_state.get("trace_sample", trace.TRACE_SAMPLE * 100) / 100)
 
-# ---------- Constantes / Schémas ----------
-DATA_DIR = Path("data")
-TRADES_CSV = DATA_DIR / "trades.csv"
-DAILY_CSV  = DATA_DIR / "daily.csv"
-
-TRADE_COLUMNS = [
-    "id","date","time","session","ticker","side",
-    "quantity","entry","exit","strategy","notes",
-    "result_usd"
-]
-DAILY_COLUMNS = [
-    "date","mood","confidence","day_type","day_result","day_pl","sessions",
-    "day_notes","lesson","checklist_ok","screenshot_path"
-]
-
+# ---------- Constantes UI ----------
 MOODS = ["😄","🙂","😐","😕","😫"]
 DAY_TYPES = ["Green","Red","Flat"]
 DAY_RESULT = ["No trade","Positive (+)","Negative (-)"]
 SESSIONS = ["Asia","London","NY"]
-
-
-# ---------- Petites fonctions utilitaires ----------
-def ensure_datafiles():
-    """Crée le dossier /data et les deux CSV vides si besoin."""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not TRADES_CSV.exists():
-        pd.DataFrame(columns=TRADE_COLUMNS).to_csv(TRADES_CSV, index=False)
-    if not DAILY_CSV.exists():
-        pd.DataFrame(columns=DAILY_COLUMNS).to_csv(DAILY_CSV, index=False)
-
-def coerce_trades_schema(df: pd.DataFrame) -> pd.DataFrame:
-    """Garantit que trades.csv a les bonnes colonnes + bons types."""
-    for col in TRADE_COLUMNS:
-        if col not in df.columns:
-            df[col] = 0.0 if col in ["quantity","entry","exit","result_usd"] else ""
-    if "date" in df: df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-    for c in ["quantity","entry","exit","result_usd"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    for c in ["session","ticker","side","strategy","notes","time"]:
-        df[c] = df[c].astype(str)
-    return df[TRADE_COLUMNS]
-
-def load_trades() -> pd.DataFrame:
-    ensure_datafiles()
-    df = pd.read_csv(TRADES_CSV)
-    return coerce_trades_schema(df) if not df.empty else pd.DataFrame(columns=TRADE_COLUMNS)
-
-def save_trades(df: pd.DataFrame):
-    coerce_trades_schema(df).to_csv(TRADES_CSV, index=False)
-
-def load_daily() -> pd.DataFrame:
-    ensure_datafiles()
-    df = pd.read_csv(DAILY_CSV)
-    if df.empty:
-        return pd.DataFrame(columns=DAILY_COLUMNS)
-    if "date" in df: df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-    for c in ["confidence","day_pl"]:
-        if c in df: df[c] = pd.to_numeric(df[c], errors="coerce")
-    for c in ["mood","day_type","day_result","sessions","day_notes","lesson","screenshot_path"]:
-        if c in df: df[c] = df[c].astype(str)
-    if "checklist_ok" in df: df["checklist_ok"] = df["checklist_ok"].fillna(False).astype(bool)
-    for col in DAILY_COLUMNS:
-        if col not in df.columns:
-            df[col] = "" if col in ["mood","day_type","day_result","sessions","day_notes","lesson","screenshot_path"] else 0
-    return df[DAILY_COLUMNS]
-
-def save_daily(df: pd.DataFrame):
-    df = df.copy()
-    for col in DAILY_COLUMNS:
-        if col not in df.columns:
-            df[col] = "" if col in ["mood","day_type","day_result","sessions","day_notes","lesson","screenshot_path"] else 0
-    df[DAILY_COLUMNS].to_csv(DAILY_CSV, index=False)
-
-def animate_line_chart(df: pd.DataFrame, x_col: str, y_col: str, total_seconds: float = 2.0):
-    """Affiche une ligne Altair avec une petite animation (dessin en ~2s)."""
-    placeholder = st.empty()
-    frames = min(30, max(2, len(df)))
-    def render(dfi):
-        chart = (alt.Chart(dfi)
-                 .mark_line()
-                 .encode(
-                    x=alt.X(f"{x_col}:T", title="Date"),
-                    y=alt.Y(f"{y_col}:Q", title="Equity ($)"),
-                    tooltip=[alt.Tooltip(f"{x_col}:T", title="Date"),
-                             alt.Tooltip(f"{y_col}:Q", title="Equity ($)", format=".2f")]
-                 ).properties(height=260))
-        placeholder.altair_chart(chart, use_container_width=True)
-    for i in range(1, frames+1):
-        idx = max(1, round(len(df) * i / frames))
-        render(df.iloc[:idx])
-        time.sleep(total_seconds/frames)
+EDITOR_PAGE_SIZES = [50, 100, 250, 500]  # lignes par page dans "Manage Trades"
+
+
+# Animation de l'equity curve (JOURNAL_ANIMATION):
+# - "client" : UN seul graphique envoyé, le tracé se dévoile en CSS dans le
+#              navigateur -> le script ne dort pas, le rerun rend la main tout de suite
+# - "server" : ancienne animation image par image (time.sleep), bloque ~2s
+# - "off"    : graphique statique
+# Au-delà de ANIMATE_MAX_POINTS points, on n'anime jamais.
+ANIMATION_MODE = os.environ.get("JOURNAL_ANIMATION", "client").lower()
+ANIMATE_MAX_POINTS = int(os.environ.get("JOURNAL_ANIMATE_MAX_POINTS", "2000"))
+# Nb max de points envoyés au navigateur par graphique (LTTB / min-max).
+# Le sous-échantillonnage se fait APRÈS le filtre Start/End: réduire la
+# plage de dates redonne donc le détail complet de la période.
+MAX_CHART_POINTS = int(os.environ.get("JOURNAL_MAX_CHART_POINTS", "1000"))
+# Limitée au conteneur du graphique animé (st.container(key=...) -> classe
+# st-key-<key>): les autres graphiques de la page ne bougent pas.
+REVEAL_CSS = """
+<style>
+@keyframes tj-reveal { from { clip-path: inset(0 100%% 0 0); } to { clip-path: inset(0 0 0 0); } }
+.st-key-%(key)s [data-testid="stVegaLiteChart"] canvas, .st-key-%(key)s [data-testid="stVegaLiteChart"] svg {
+  animation: tj-reveal %(seconds).2fs ease-out;
+}
+</style>
+"""
+
+def equity_chart(df: pd.DataFrame, x_col: str, y_col: str):
+    import altair as alt  # import tardif: seule la page Progress en a besoin
+    return (alt.Chart(df)
+            .mark_line()
+            .encode(
+               x=alt.X(f"{x_col}:T", title="Date"),
+               y=alt.Y(f"{y_col}:Q", title="Equity ($)"),
+               tooltip=[alt.Tooltip(f"{x_col}:T", title="Date"),
+                        alt.Tooltip(f"{y_col}:Q", title="Equity ($)", format=".2f")]
+            ).properties(height=260))
+
+def animate_line_chart(df: pd.DataFrame, x_col: str, y_col: str, total_seconds: float = 2.0,
+                       mode: str = ANIMATION_MODE, key: str = "equity"):
+    """Affiche une ligne Altair avec une petite animation (dessin en ~2s)
+    dans le conteneur `key`."""
+    animate = len(df) <= ANIMATE_MAX_POINTS
+    with st.container(key=key):
+        if mode == "server" and animate:
+            placeholder = st.empty()
+            frames = min(30, max(2, len(df)))
+            for i in range(1, frames+1):
+                idx = max(1, round(len(df) * i / frames))
+                placeholder.altair_chart(equity_chart(df.iloc[:idx], x_col, y_col), use_container_width=True)
+                time.sleep(total_seconds/frames)
+            return
+        if mode == "client" and animate:
+            st.markdown(REVEAL_CSS % {"key": key, "seconds": total_seconds}, unsafe_allow_html=True)
+        st.altair_chart(equity_chart(df, x_col, y_col), use_container_width=True)
 
 
 # ---------- UI ----------
+def reset_editors(prefix: str = "", keep: tuple = ()):
+    """Oublie les instantanés/éditions en cours (après une écriture de cette session),
+    sauf les clés `keep`."""
+    for k in [k for k in st.session_state.keys() if str(k).startswith(prefix) and k not in keep and
+              (str(k).startswith("trades_editor_") or str(k).startswith("daily_editor"))]:
+        del st.session_state[k]
+
 st.title("🗒️ Trading Journal")
 
 with st.sidebar:
+    # Journal (un par trader): choisi AVANT toute lecture de données.
+    # ?journal=<nom> dans l'URL présélectionne un journal existant.
+    journals = list_journals()
+    if "journal_next" in st.session_state:  # journal tout juste créé
+        st.session_state["journal"] = st.session_state.pop("journal_next")
+    if st.session_state.get("journal") not in journals:
+        wanted = st.query_params.get("journal", DEFAULT_JOURNAL)
+        st.session_state["journal"] = wanted if wanted in journals else DEFAULT_JOURNAL
+    journal = st.selectbox("Journal", journals, key="journal")
+    set_journal(journal)
+    if st.session_state.get("journal_active") != journal:
+        reset_editors()  # instantanés d'éditeur = données de l'autre journal
+        st.session_state["journal_active"] = journal
+    with st.expander("New journal"):
+        new_name = st.text_input("Name", key="new_journal", placeholder="e.g. alice")
+        if st.button("Create journal", use_container_width=True):
+            try:
+                create_journal(new_name.strip())
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state["journal_next"] = new_name.strip()
+                st.rerun()
+    st.markdown("---")
     page = st.radio("Navigation", ["📝 Journal","📈 Progress"], index=0)
+    if trace_run is not None:
+        trace_run["label"] = f"{journal} · {page}"
     st.markdown("---")
-    if st.button("🗑️ Reset ALL data", use_container_width=True):
-        pd.DataFrame(columns=TRADE_COLUMNS).to_csv(TRADES_CSV, index=False)
-        pd.DataFrame(columns=DAILY_COLUMNS).to_csv(DAILY_CSV, index=False)
-        st.success("All data cleared.")
+    with st.expander("CSV import / export"):
+        if st.checkbox("Prepare export", value=False):
+            st.download_button("⬇️ Export trades.csv", export_csv(load_trades()), "trades.csv",
+                               mime="text/csv", use_container_width=True)
+            st.download_button("⬇️ Export daily.csv", export_csv(load_daily()), "daily.csv",
+                               mime="text/csv", use_container_width=True)
+        up_trades = st.file_uploader("Import trades CSV (replaces)", type="csv", key="imp_trades")
+        if up_trades is not None and st.button("Import trades", use_container_width=True):
+            save_trades(pd.read_csv(up_trades))
+            reset_editors("trades_editor_")
+            st.success("Trades imported.")
+        up_daily = st.file_uploader("Import daily CSV (replaces)", type="csv", key="imp_daily")
+        if up_daily is not None and st.button("Import daily", use_container_width=True):
+            save_daily(coerce_daily_schema(pd.read_csv(up_daily)))
+            reset_editors("daily_editor")
+            st.success("Daily notes imported.")
+    # Sauvegardes = instantanés dédoublonnés (journal_core/snapshots.py):
+    # quasi instantanés, la place prise ne dépend que de ce qui a changé.
+    with st.expander("Data safety"):
+        if st.button("🛟 Backup now", use_container_width=True):
+            snap = take_snapshot("manual")
+            st.success(f"Backup saved ({snap['rows']['trades']} trades, {snap['rows']['daily']} notes).")
+        snaps = list_snapshots()
+        if snaps:
+            chosen = st.selectbox(
+                "Restore point", snaps,
+                format_func=lambda s: f"{s['created'].replace('T', ' ')} · {s['rows']['trades']} trades"
+                                      + (f" · {s['label']}" if s["label"] else ""))
+            if st.button("↩️ Restore this backup", use_container_width=True):
+                restore_snapshot(chosen)
+                reset_editors()
+                st.success(f"Restored backup of {chosen['created'].replace('T', ' ')} "
+                           "(the previous state was backed up first).")
+        else:
+            st.caption("No backup yet.")
+    if st.button("🗑️ Reset ALL data (with backup)", use_container_width=True):
+        reset_journal()
+        clear_data_cache()
+        reset_editors()
+        st.success("All data cleared (a backup was taken first).")
 
 # ---------------- PAGE 1 — JOURNAL ----------------
 if page.startswith("📝"):
@@ -154,7 +213,7 @@ Stay disciplined, take honest notes… and watch your equity curve grow 📈.
             if not ticker or entry <= 0 or exit_ <= 0 or qty <= 0:
                 st.error("Please fill Pair, Entry Price, Exit Price and Lot size (>0).")
             else:
-                new_row = pd.DataFrame([{
+                append_trade({
                     "id": datetime.now().strftime("%Y%m%d%H%M%S%f"),
                     "date": t_date.isoformat(),
                     "time": t_time.strftime("%H:%M"),
@@ -167,9 +226,8 @@ Stay disciplined, take honest notes… and watch your equity curve grow 📈.
                     "strategy": "",      # laissé vide, colonne masquée dans l'UI
                     "notes": notes,
                     "result_usd": float(result_usd),
-                }])
-                df = load_trades()
-                save_trades(pd.concat([df, new_row], ignore_index=True))
+                })
+                reset_editors("trades_editor_")
                 st.success(f"Saved: {ticker.upper()} {side} | Qty={qty:.2f} | Result=${result_usd:.2f}")
 
     # --- Daily Notes ---
@@ -190,9 +248,8 @@ Stay disciplined, take honest notes… and watch your equity curve grow 📈.
             day_notes = st.text_area("Global notes (day)", placeholder="What went well / what to improve", height=110)
             lesson = st.text_input("Key lesson (one sentence)")
         if st.form_submit_button("Save daily notes", use_container_width=True):
-            ddf = load_daily()
-            ddf = ddf[ddf["date"] != j_date]  # garde la dernière version de la journée
-            new_row = pd.DataFrame([{
+            # upsert par date: garde la dernière version de la journée
+            upsert_daily(pd.DataFrame([{
                 "date": j_date.isoformat(),
                 "mood": mood,
                 "confidence": confidence,
@@ -204,163 +261,277 @@ Stay disciplined, take honest notes… and watch your equity curve grow 📈.
                 "lesson": lesson,
                 "checklist_ok": bool(checklist_ok),
                 "screenshot_path": ""
-            }])
-            save_daily(pd.concat([ddf, new_row], ignore_index=True))
+            }]))
+            reset_editors("daily_editor")
             st.success("Daily notes saved.")
 
+    # --- Search notes ---
+    # Index plein texte (journal_core/search.py): notes des trades, notes du
+    # jour et leçons; mots en préfixe ("break ret" trouve "breakout retest").
+    st.markdown("### 🔎 Search notes")
+    s1, s2, s3 = st.columns([2,1,1])
+    with s1:
+        q = st.text_input("Keywords", key="search_q", placeholder="breakout, FOMC, revenge…")
+    with s2:
+        q_start = st.date_input("From", value=None, key="search_start")
+    with s3:
+        q_end = st.date_input("To", value=None, key="search_end")
+    if q.strip():
+        hits = search(q, q_start, q_end, limit=100)
+        if hits.empty:
+            st.info("No note matches.")
+        else:
+            st.caption(f"{len(hits)} match(es), most relevant first (max 100).")
+            with span("render.search"):
+                st.dataframe(hits[["kind","date","ticker","snippet","key"]], use_container_width=True, hide_index=True)
+            # retour aux trades trouvés: lignes complètes, triées comme les résultats
+            ids = hits.loc[hits["kind"] == "trade", "key"].tolist()
+            if ids:
+                found = load_trades().set_index("id", drop=False).reindex(ids).dropna(subset=["id"])
+                st.markdown("Matching trades")
+                with span("render.search"):
+                    st.dataframe(found[["date","time","session","ticker","side","quantity","entry","exit","notes","result_usd"]],
+                                 use_container_width=True, hide_index=True)
+
     # --- Manage Trades (Edit/Delete) ---
     st.markdown("### Manage Trades (Edit / Delete)")
-    tdf = load_trades()
-    if tdf.empty:
+    # Seule une page (filtrée par dates/paires) est envoyée à l'éditeur;
+    # à l'enregistrement, seules les lignes modifiées/supprimées sont écrites (par id).
+    tbounds = trade_kpis()
+    if tbounds["total"] == 0:
         st.info("No trades yet.")
     else:
-        if "delete" not in tdf.columns:
-            tdf["delete"] = False
+        m1, m2, m3, m4 = st.columns([1,1,2,1])
+        with m1:
+            m_start = st.date_input("From", value=tbounds["first"], key="mt_start")
+        with m2:
+            m_end = st.date_input("To", value=tbounds["last"], key="mt_end")
+        with m3:
+            m_pairs = st.multiselect("Pairs", trade_tickers(), key="mt_pairs")
+        with m4:
+            page_size = st.selectbox("Rows / page", EDITOR_PAGE_SIZES, index=0, key="mt_page_size")
+        n_rows = trade_kpis(m_start, m_end, m_pairs)["total"]
+        n_pages = max(1, -(-n_rows // page_size))
+        page_no = st.number_input(f"Page (1–{n_pages}) · {n_rows} trades", min_value=1, max_value=n_pages,
+                                  value=1, step=1, key="mt_page")
+        editor_key = f"trades_editor_{m_start}_{m_end}_{','.join(m_pairs)}_{page_size}_{page_no}"
+        # L'éditeur affiche un instantané stable de la page: c'est la référence
+        # du change-set (et de la détection de conflits) au moment de sauver.
+        if editor_key + "_snapshot" not in st.session_state:
+            # autre page / autres filtres: seule la page affichée garde son instantané
+            reset_editors("trades_editor_", keep=(editor_key, editor_key + "_snapshot"))
+            page_df = query_trades(m_start, m_end, m_pairs, columns=TRADE_COLUMNS, newest_first=True,
+                                   limit=page_size, offset=(page_no - 1) * page_size).reset_index(drop=True)
+            # catégories -> texte: sinon l'éditeur n'accepte que les valeurs
+            # existantes (impossible de saisir une nouvelle paire)
+            page_df[TRADE_CATEGORY_COLUMNS] = page_df[TRADE_CATEGORY_COLUMNS].astype(str)
+            page_df["delete"] = False
+            st.session_state[editor_key + "_snapshot"] = page_df
+        tdf = st.session_state[editor_key + "_snapshot"]
         from streamlit import column_config as cc
-        edited = st.data_editor(
-            tdf,
-            use_container_width=True,
-            num_rows="fixed",
-            # On cache 'id' et 'strategy' en ne les mettant pas dans l'ordre des colonnes
-            column_order=["date","time","session","ticker","side","quantity","entry","exit","notes","result_usd","delete"],
-            column_config={
-                "date": cc.DateColumn("date", format="YYYY-MM-DD"),
-                "time": cc.Column("time", help="HH:MM"),
-                "session": cc.SelectboxColumn("session", options=SESSIONS),
-                "ticker": cc.Column("ticker"),
-                "side": cc.SelectboxColumn("side", options=["Long","Short"]),
-                "quantity": cc.NumberColumn("quantity", step=0.01, min_value=0.0),
-                "entry": cc.NumberColumn("entry", step=0.0001, format="%.4f", min_value=0.0),
-                "exit": cc.NumberColumn("exit", step=0.0001, format="%.4f", min_value=0.0),
-                "notes": cc.Column("notes"),
-                "result_usd": cc.NumberColumn("result_usd", step=1.0),
-                "delete": cc.CheckboxColumn("delete"),
-            },
-            hide_index=True,
-        )
+        with span("render.trades_editor"):  # sérialisation Arrow de la page
+            edited = st.data_editor(
+                tdf,
+                use_container_width=True,
+                num_rows="fixed",
+                # On cache 'id' et 'strategy' en ne les mettant pas dans l'ordre des colonnes
+                column_order=["date","time","session","ticker","side","quantity","entry","exit","notes","result_usd","delete"],
+                column_config={
+                    "date": cc.DateColumn("date", format="YYYY-MM-DD"),
+                    "time": cc.Column("time", help="HH:MM"),
+                    "session": cc.SelectboxColumn("session", options=SESSIONS),
+                    "ticker": cc.TextColumn("ticker"),
+                    "side": cc.SelectboxColumn("side", options=["Long","Short"]),
+                    "quantity": cc.NumberColumn("quantity", step=0.01, min_value=0.0),
+                    "entry": cc.NumberColumn("entry", step=0.0001, format="%.4f", min_value=0.0),
+                    "exit": cc.NumberColumn("exit", step=0.0001, format="%.4f", min_value=0.0),
+                    "notes": cc.Column("notes"),
+                    "result_usd": cc.NumberColumn("result_usd", step=1.0),
+                    "delete": cc.CheckboxColumn("delete"),
+                },
+                hide_index=True,
+                # une clé par page: les éditions d'une page ne "débordent" pas sur la suivante
+                key=editor_key,
+            )
         c1, c2 = st.columns(2)
         if c1.button("💾 Save changes (trades)", use_container_width=True):
-            edited = edited[edited.get("delete", False) == False].drop(columns=["delete"], errors="ignore")
+            edited = edited.copy()
             if not edited.empty:
-                edited["date"] = pd.to_datetime(edited["date"], errors="coerce").dt.date
+                edited["date"] = pd.to_datetime(edited["date"], errors="coerce").dt.normalize()  # comme le stockage
                 for c in ["quantity","entry","exit","result_usd"]:
                     if c in edited: edited[c] = pd.to_numeric(edited[c], errors="coerce").fillna(0.0)
                 edited["ticker"] = edited["ticker"].astype(str).str.upper()
-            save_trades(edited)
-            st.success("Trades saved.")
+            changes = compute_changeset(tdf, edited, "id")
+            try:
+                apply_trade_changeset(changes, tdf)
+            except ConflictError as e:
+                st.error(f"Not saved: {e}")
+            else:
+                reset_editors("trades_editor_")
+                st.success(f"Trades saved ({len(changes['updated'])} updated, {len(changes['deleted'])} deleted).")
         if c2.button("↩️ Reload trades", use_container_width=True):
+            reset_editors("trades_editor_")
             st.rerun()
 
     # --- Manage Daily Notes (Edit/Delete) ---
     st.markdown("### Manage Daily Notes (Edit / Delete)")
-    ndf = load_daily()
+    if "daily_editor_snapshot" not in st.session_state:
+        snap = load_daily().reset_index(drop=True)
+        snap["delete"] = False
+        st.session_state["daily_editor_snapshot"] = snap
+    ndf = st.session_state["daily_editor_snapshot"]
     if ndf.empty:
         st.info("No daily notes yet.")
     else:
-        if "delete" not in ndf.columns:
-            ndf["delete"] = False
         from streamlit import column_config as cc
-        edited_notes = st.data_editor(
-            ndf,
-            use_container_width=True,
-            num_rows="fixed",
-            column_config={
-                "date": cc.DateColumn("date", format="YYYY-MM-DD"),
-                "mood": cc.SelectboxColumn("mood", options=MOODS),
-                "confidence": cc.NumberColumn("confidence", min_value=0, max_value=100, step=1),
-                "day_type": cc.SelectboxColumn("day_type", options=DAY_TYPES),
-                "day_result": cc.SelectboxColumn("day_result", options=DAY_RESULT),
-                "day_pl": cc.NumberColumn("day_pl", step=1.0),
-                "sessions": cc.Column("sessions", help="Comma-separated (Asia,London,NY)"),
-                "day_notes": cc.Column("day_notes"),
-                "lesson": cc.Column("lesson"),
-                "checklist_ok": cc.CheckboxColumn("checklist_ok"),
-                "screenshot_path": cc.Column("screenshot_path"),
-                "delete": cc.CheckboxColumn("delete"),
-            },
-            hide_index=True,
-        )
+        with span("render.daily_editor"):
+            edited_notes = st.data_editor(
+                ndf,
+                use_container_width=True,
+                num_rows="fixed",
+                column_config={
+                    "date": cc.DateColumn("date", format="YYYY-MM-DD"),
+                    "mood": cc.SelectboxColumn("mood", options=MOODS),
+                    "confidence": cc.NumberColumn("confidence", min_value=0, max_value=100, step=1),
+                    "day_type": cc.SelectboxColumn("day_type", options=DAY_TYPES),
+                    "day_result": cc.SelectboxColumn("day_result", options=DAY_RESULT),
+                    "day_pl": cc.NumberColumn("day_pl", step=1.0),
+                    "sessions": cc.Column("sessions", help="Comma-separated (Asia,London,NY)"),
+                    "day_notes": cc.Column("day_notes"),
+                    "lesson": cc.Column("lesson"),
+                    "checklist_ok": cc.CheckboxColumn("checklist_ok"),
+                    "screenshot_path": cc.Column("screenshot_path"),
+                    "delete": cc.CheckboxColumn("delete"),
+                },
+                hide_index=True,
+                key="daily_editor",
+            )
         c3, c4 = st.columns(2)
         if c3.button("💾 Save changes (daily)", use_container_width=True):
-            edited_notes = edited_notes[edited_notes.get("delete", False) == False].drop(columns=["delete"], errors="ignore")
+            edited_notes = edited_notes.copy()
             if not edited_notes.empty:
                 edited_notes["date"] = pd.to_datetime(edited_notes["date"], errors="coerce").dt.date
                 if "confidence" in edited_notes: edited_notes["confidence"] = pd.to_numeric(edited_notes["confidence"], errors="coerce").fillna(0).clip(0,100)
                 if "day_pl" in edited_notes: edited_notes["day_pl"] = pd.to_numeric(edited_notes["day_pl"], errors="coerce").fillna(0.0)
                 if "sessions" in edited_notes: edited_notes["sessions"] = edited_notes["sessions"].astype(str).str.replace(", ", ",")
-            save_daily(edited_notes)
-            st.success("Daily notes saved.")
+            changes = compute_changeset(ndf, edited_notes, "date")  # date modifiée = delete + insert
+            try:
+                apply_daily_changeset(changes, ndf)
+            except ConflictError as e:
+                st.error(f"Not saved: {e}")
+            else:
+                reset_editors("daily_editor")
+                st.success("Daily notes saved.")
         if c4.button("↩️ Reload daily", use_container_width=True):
+            reset_editors("daily_editor")
             st.rerun()
 
 # ---------------- PAGE 2 — PROGRESS ----------------
 else:
     st.subheader("Progress Overview")
 
-    trades = load_trades()
+    # Bornes / paires / KPIs / courbes: lus dans les agrégats incrémentaux,
+    # coût proportionnel au nb de jours x paires, pas au nb de trades
+    bounds = trade_kpis()
     daily  = load_daily()
 
-    if trades.empty and daily.empty:
+    if bounds["total"] == 0 and daily.empty:
         st.info("No data yet. Go to the Journal page to add entries.")
     else:
-        # On n'utilise que result_usd pour les stats
-        trades["_pl_for_stats"] = pd.to_numeric(trades["result_usd"], errors="coerce").fillna(0.0)
-
         c1, c2, c3 = st.columns([1,1,2])
         with c1:
-            start = st.date_input("Start", value=trades["date"].min() if not trades.empty else date.today())
+            start = st.date_input("Start", value=bounds["first"] or date.today())
         with c2:
-            end = st.date_input("End", value=trades["date"].max() if not trades.empty else date.today())
+            end = st.date_input("End", value=bounds["last"] or date.today())
         with c3:
-            pairs = sorted(trades["ticker"].dropna().unique().tolist()) if not trades.empty else []
+            pairs = trade_tickers()
             sel = st.multiselect("Pairs", pairs)
 
-        flt = trades.copy()
-        if not flt.empty:
-            if start: flt = flt[flt["date"] >= start]
-            if end:   flt = flt[flt["date"] <= end]
-            if sel:   flt = flt[flt["ticker"].isin(sel)]
+        # On n'utilise que result_usd pour les stats
+        kpis = trade_kpis(start, end, sel)
 
         k1,k2,k3 = st.columns(3)
-        if flt.empty:
+        if kpis["total"] == 0:
             for k in (k1,k2,k3): k.markdown("—")
         else:
-            wins = (flt["_pl_for_stats"]>0).sum(); total=len(flt)
+            wins = kpis["wins"]; total = kpis["total"]
             k1.metric("Total trades", total)
             k2.metric("Win rate", f"{(wins/total*100):.1f}%")
-            k3.metric("Total P/L ($)", f"{flt['_pl_for_stats'].sum():.2f}")
+            k3.metric("Total P/L ($)", f"{kpis['pnl']:.2f}")
+            series = progress_series(start, end, sel)
+
+            # Risque: drawdown sur l'equity journalière, ratios, séries
+            risk = risk_metrics(start, end, sel)
+            fmt = lambda v, spec=".2f": "—" if v is None else f"{v:{spec}}"
+            r1,r2,r3,r4 = st.columns(4)
+            r1.metric("Max drawdown ($)", fmt(risk["max_dd"]),
+                      help=f"Avg drawdown: {fmt(risk['avg_dd'])} $")
+            r2.metric("Drawdown duration (days)", risk["max_dd_days"],
+                      help=f"Recovery: {fmt(risk['recovery_days'], 'd')} days · "
+                           f"longest drawdown: {risk['longest_dd_days']} days")
+            r3.metric("Profit factor", fmt(risk["profit_factor"]),
+                      help=f"Expectancy: {fmt(risk['expectancy'])} $ per trade")
+            r4.metric("Sharpe / Sortino", f"{fmt(risk['sharpe'])} / {fmt(risk['sortino'])}",
+                      help="Annualised on daily P/L (business days without trades count as 0)")
+            st.caption(f"Longest win streak: {risk['win_streak']} · longest loss streak: {risk['loss_streak']} · "
+                       f"avg win: {fmt(risk['avg_win'])} $ · avg loss: {fmt(risk['avg_loss'])} $")
 
             # Equity Curve (cumul dans le temps) — animé
             st.markdown("### Equity curve - Results ($) over time")
             st.caption("• X-axis = Date • Y-axis = Equity ($), cumulative sum of your Result($)")
-            curve = flt.sort_values("date")[["date","_pl_for_stats"]].copy()
+            with span("aggregate.downsample"):
+                curve = lttb_frame(series["equity"], "date", "Equity", MAX_CHART_POINTS)
             if not curve.empty:
-                curve["date"] = pd.to_datetime(curve["date"])
-                curve["Equity"] = curve["_pl_for_stats"].cumsum()
-                curve = curve.groupby("date", as_index=False)["Equity"].last()
-                animate_line_chart(curve, "date", "Equity", total_seconds=2.0)
+                with span("render.equity_chart"):
+                    animate_line_chart(curve, "date", "Equity", total_seconds=2.0)
 
             # Weekly / Monthly
             st.markdown("### Weekly/Monthly Results ($)")
-            tmp = flt.copy()
-            tmp["date"] = pd.to_datetime(tmp["date"], errors="coerce")
-            weekly  = tmp.resample('W-MON', on='date')["_pl_for_stats"].sum().rename("Weekly P/L ($)")
-            monthly = tmp.resample('MS',     on='date')["_pl_for_stats"].sum().rename("Monthly P/L ($)")
-            st.bar_chart(weekly)
-            st.bar_chart(monthly)
+            with span("aggregate.downsample"):
+                weekly = minmax_series(series["weekly"], MAX_CHART_POINTS)
+                monthly = minmax_series(series["monthly"], MAX_CHART_POINTS)
+            with span("render.bar_charts"):
+                st.bar_chart(weekly)
+                st.bar_chart(monthly)
 
         st.markdown("### Daily Notes (range)")
         if not daily.empty:
-            dflt = daily.copy()
-            if start: dflt = dflt[dflt["date"] >= start]
-            if end:   dflt = dflt[dflt["date"] <= end]
-            st.dataframe(dflt.sort_values("date", ascending=False), use_container_width=True)
+            dflt = query_daily(start, end)
+            with span("render.daily_table"):
+                st.dataframe(dflt.sort_values("date", ascending=False), use_container_width=True)
 
         st.markdown("### Trades Table")
-        # On cache 'id' ici aussi
-        st.dataframe(
-            flt.drop(columns=["id"], errors="ignore").sort_values(["date","time"], ascending=False),
-            use_container_width=True
-        )
+        # Table complète des trades filtrés; on cache 'id' ici aussi
+        table = query_trades(start, end, sel).drop(columns=["id"], errors="ignore")
+        with span("render.trades_table"):
+            st.dataframe(table.sort_values("timestamp", ascending=False).drop(columns="timestamp"),
+                         use_container_width=True)
 
 st.caption("Result($) is your manual P/L · Equity = cumulative Result($) over time · Weekly/Monthly = period sums · data in data/")
+
+# ---------- ⏱️ Performance (debug) ----------
+# Rendu APRÈS la fin du chronométrage: le panneau montre le rerun qui vient
+# de se terminer, sans compter son propre affichage.
+trace_run = trace.end(trace_run)
+if trace_run is not None:
+    st.session_state.setdefault("trace_runs", deque(maxlen=trace.TRACE_KEEP)).append(trace_run)
+with st.sidebar:
+    with st.expander("⏱️ Performance"):
+        st.checkbox("Time each rerun", value=trace.TRACE_DEFAULT, key="trace_on",
+                    help="Per-stage timings: load, coerce, save, filter, aggregate, render")
+        st.slider("Sampled reruns (%)", 1, 100, int(trace.TRACE_SAMPLE * 100), key="trace_sample",
+                  help="Only this share of reruns is measured")
+        runs = st.session_state.get("trace_runs")
+        if not st.session_state.get("trace_on") or not runs:
+            st.caption("No measured rerun yet.")
+        else:
+            last = runs[-1]
+            st.caption(f"Last measured rerun: {last['total_us'] / 1000:.1f} ms · {last['label']} · {last['started'][11:]}")
+            st.dataframe(trace.breakdown(last), use_container_width=True, hide_index=True)
+            if last["spans"]:  # détail, dans l'ordre d'exécution (depth = imbrication)
+                spans = pd.DataFrame(last["spans"])
+                st.dataframe(spans.assign(ms=spans["us"] / 1000)[["name", "depth", "ms"]],
+                             use_container_width=True, hide_index=True)
+            st.download_button(f"⬇️ Export trace ({len(runs)} reruns, JSON)", trace.chrome_trace(list(runs)),
+                               "journal-trace.json", mime="application/json", use_container_width=True,
+                               help="Open in https://ui.perfetto.dev or chrome://tracing")
@@ -10,7 +10,15 @@ from datetime import datetime, date, time
 from pathlib import Path
 from typing import List
 
+from downsample import lttb_series
+from journal_core import trade_math
+from journal_core.analytics import drawdown_stats
+from journal_core.cards import cards_html
+from journal_core.filter_index import build_filter_index, filter_rows, tag_names
+
 APP_TITLE = "🗒️ Trading Journal — Notion Style"
+MAX_CHART_POINTS = 1000  # points max envoyés au graphique d'equity
+CARD_PAGE_SIZES = [25, 50, 100, 200]  # cartes rendues par rerun
 DATA_DIR = Path("data")
 CSV_PATH = DATA_DIR / "trades.csv"
 
@@ -77,38 +85,33 @@ def reset_journal():
 # Calculations
 # -----------------------------
 
+# Calculs vectorisés dans journal_core.trade_math (mêmes règles);
+# ces fonctions scalaires servent au formulaire (un trade à la fois).
 def compute_rr_planned(side: str, entry: float, stop: float, target: float) -> float:
-    if entry and stop and target and entry > 0:
-        if side == "Long":
-            risk = entry - stop
-            reward = target - entry
-        else:  # Short
-            risk = stop - entry
-            reward = entry - target
-        if risk <= 0:
-            return 0.0
-        return round(reward / risk, 2)
-    return 0.0
+    return float(trade_math.rr_planned(side, entry, stop, target)[0])
 
 
 def compute_pnl(side: str, entry: float, exit_: float, qty: float, fees: float) -> float:
-    if not all([qty is not None, entry is not None, exit_ is not None]):
-        return 0.0
-    direction = 1 if side == "Long" else -1
-    return direction * (exit_ - entry) * qty - (fees or 0.0)
+    return float(trade_math.pnl(side, entry, exit_, qty, fees)[0])
 
 
 def compute_r_multiple(pnl: float, risk_ccy: float, qty: float, entry: float, stop: float) -> float:
-    # Prefer explicit risk in currency; else derive from entry/stop * qty
-    if risk_ccy and risk_ccy > 0:
-        denom = risk_ccy
-    else:
-        if entry and stop and qty and qty > 0:
-            per_unit = abs(entry - stop)
-            denom = per_unit * qty
-        else:
-            return 0.0
-    return round(pnl / denom, 2) if denom > 0 else 0.0
+    return float(trade_math.r_multiple(pnl, risk_ccy, qty, entry, stop)[0])
+
+
+@st.cache_resource(max_entries=2)
+def journal_view(mtime_ns: int, size: int) -> tuple:
+    """Trades triés (plus récents d'abord) + index des filtres, recalculés
+    seulement quand trades.csv change (clé = mtime + taille)."""
+    df = load_trades()
+    if not df.empty:
+        df = df.sort_values("timestamp", ascending=False, kind="stable").reset_index(drop=True)
+    return df, build_filter_index(df)
+
+
+def recompute_journal(fees: float | None = None):
+    """Recalcule pnl / RR / R-multiple de tout l'historique (ex. nouveaux frais)."""
+    save_trades(trade_math.recompute_trades(load_trades(), fees=fees))
 
 
 # -----------------------------
@@ -150,6 +153,11 @@ with st.sidebar:
         reset_journal()
         st.success("Journal cleared. Fresh start ✨")
     st.caption("Astuce: les changements d'UI ne suppriment pas les données; ce bouton, si.")
+    override_fees = st.checkbox("Override fees on all trades")
+    new_fees = st.number_input("Fees per trade", min_value=0.0, step=0.01, disabled=not override_fees)
+    if st.button("🔁 Recompute PnL / R (all trades)", use_container_width=True):
+        recompute_journal(new_fees if override_fees else None)
+        st.success("PnL, R:R and R-multiple recomputed.")
 
 # ---- New Entry Form (Notion-like) ----
 st.markdown("### ✍️ New Entry")
@@ -212,7 +220,7 @@ with st.container(border=True):
                 "confidence": confidence,
                 "notes": notes,
                 "rr_planned": rr_planned,
-                "rr_realized": 0.0,
+                "rr_realized": float(trade_math.rr_realized(side, entry, stop, exit_)[0]),
                 "pnl": pnl,
                 "r_multiple": r_mult,
             }
@@ -234,8 +242,8 @@ else:
     win_rate = (wins/total)*100 if total else 0
     total_pnl = df["pnl"].sum()
     avg_r = df["r_multiple"].mean()
-    eq = df["pnl"].cumsum()
-    max_dd = (eq - eq.cummax()).min() if not eq.empty else 0
+    daily_pl = df.groupby(pd.to_datetime(df["date"], errors="coerce"))["pnl"].sum()
+    max_dd = drawdown_stats(daily_pl)["max_dd"]  # equity triée par date
 
     col_k1.markdown(f'<div class="kpi"><div class="val">{total}</div><div class="meta">Total trades</div></div>', unsafe_allow_html=True)
     col_k2.markdown(f'<div class="kpi"><div class="val">{win_rate:.1f}%</div><div class="meta">Win rate</div></div>', unsafe_allow_html=True)
@@ -248,10 +256,14 @@ st.markdown("### 📈 Equity Curve")
 if df.empty:
     st.info("No trades yet. Add an entry above.")
 else:
-    st.line_chart(df["pnl"].cumsum(), height=220)
+    st.line_chart(lttb_series(df.sort_values("timestamp")["pnl"].cumsum().reset_index(drop=True), MAX_CHART_POINTS), height=220)
 
 # ---- Filters ----
 st.markdown("### 🔎 Journal View")
+# Filtres = ET de bitmaps (journal_core.filter_index): tags en correspondance
+# exacte ("NY" ne trouve plus "NYC"), strategy / side / ticker en catégories.
+stat = CSV_PATH.stat()
+view, fidx = journal_view(stat.st_mtime_ns, stat.st_size)
 fc1, fc2, fc3, fc4 = st.columns([1,1,1,2])
 with fc1:
     f_ticker = st.text_input("Filter: Ticker")
@@ -260,35 +272,26 @@ with fc2:
 with fc3:
     f_strategy = st.selectbox("Filter: Strategy", ["All"] + DEFAULT_STRATEGIES, index=0)
 with fc4:
-    f_tag = st.text_input("Filter: Tag (contains)")
-
-flt = df.copy()
-if not flt.empty:
-    if f_ticker:
-        flt = flt[flt["ticker"].str.contains(f_ticker.upper(), na=False)]
-    if f_side != "All":
-        flt = flt[flt["side"] == f_side]
-    if f_strategy != "All":
-        flt = flt[flt["strategy"] == f_strategy]
-    if f_tag:
-        flt = flt[flt["tags"].fillna("").str.contains(f_tag, case=False, na=False)]
+    f_tags = st.multiselect("Filter: Tags (all of)", sorted(set(tag_names(fidx)) | set(DEFAULT_TAGS), key=str.casefold))
+
+flt = view.iloc[filter_rows(fidx, f_tags, contains={"ticker": f_ticker}, side=f_side, strategy=f_strategy)]
 
 # ---- Card list (Notion-like) ----
+# Une page de cartes = un seul bloc HTML assemblé par colonnes
+# (journal_core.cards): le coût suit la taille de page, pas le journal.
 if flt.empty:
     st.caption("No entries match your filters.")
 else:
-    for _, r in flt.sort_values("timestamp", ascending=False).iterrows():
-        tags_html = " ".join([f'<span class="tag">{t.strip()}</span>' for t in str(r.get("tags","")) .split(',') if t.strip()])
-        st.markdown(
-            f'''<div class="card">
-                <h4>{r['ticker']} · {r['side']} · <span class="badge">{r['strategy']}</span></h4>
-                <div class="meta">{r['date']} {str(r['time'])} · Mood {r['mood']} · Conf {int(r.get('confidence',0))}% · RR plan {r.get('rr_planned',0):.2f} · R {r.get('r_multiple',0):.2f}</div>
-                <div style="margin:8px 0;">{tags_html}</div>
-                <div class="meta">Entry {r.get('entry','–')} · Stop {r.get('stop','–')} · Target {r.get('target','–')} · Exit {r.get('exit','–')} · Qty {r.get('quantity','–')} · PnL <b>{r.get('pnl',0):.2f}</b></div>
-                <div style="margin-top:10px; white-space:pre-wrap;">{(r.get('notes') or '').strip()}</div>
-            </div>''',
-            unsafe_allow_html=True
-        )
+    pc1, pc2, pc3 = st.columns([1,1,3])
+    with pc1:
+        page_size = st.selectbox("Cards per page", CARD_PAGE_SIZES, index=0)
+    n_pages = (len(flt) + page_size - 1) // page_size
+    with pc2:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+    with pc3:
+        first = (page - 1) * page_size
+        st.caption(f"{first + 1}–{min(first + page_size, len(flt))} of {len(flt)} entries · page {page}/{n_pages}")
+    st.markdown(cards_html(flt.iloc[first:first + page_size]), unsafe_allow_html=True)  # déjà trié (plus récents d'abord)
 
 st.caption("Data saved locally in data/trades.csv · Use the reset button to wipe and start fresh.")
 
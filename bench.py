@@ -0,0 +1,241 @@
+# bench.py — banc d'essai des chemins chauds du journal (sans Streamlit)
+# -----------------------------------------------------------
+# Usage:
+#   python bench.py [--sizes 1k,100k,1M,10M] [--repeat 3] [--tickers 12]
+#                   [--sessions Asia,London,NY] [--start 2020-01-01] [--days 1825]
+#                   [--note-len 80] [--out bench.json] [--compare old.json]
+# - générateur de trades synthétiques (paires, sessions, période, notes)
+# - étapes chronométrées à chaque taille: coercition, écriture, lecture
+#   (froide / en cache), agrégats, filtres Progress et vue Journal, KPIs,
+#   equity + risque, préparation des graphiques et d'une page de cartes
+# - résultats en JSON (versions, moteur de stockage, meilleur / médian par
+#   étape) pour comparer deux versions: --compare signale les régressions
+# Le stockage part dans un dossier temporaire; le moteur suit JOURNAL_STORAGE,
+# JOURNAL_PARTITION et JOURNAL_WAL comme l'app. 10M lignes: ~10 Go de RAM.
+# -----------------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from downsample import lttb_frame, minmax_series
+from journal_core import analytics, storage
+from journal_core.analytics import (drawdown_stats, filter_buckets, kpis_from_buckets, ratio_stats,
+                                    series_from_buckets, trade_stats)
+from journal_core.cards import cards_html
+from journal_core.filter_index import build_filter_index, filter_rows
+from journal_core.schema import PROGRESS_COLUMNS, TRADE_COLUMNS, coerce_trades_schema, memory_usage
+
+DEFAULT_SIZES = "1k,100k,1M,10M"
+BASE_TICKERS = ["XAUUSD", "EURUSD", "GBPUSD", "USDJPY", "NAS100", "US30", "BTCUSD", "GER40"]
+STRATEGIES = ["Breakout", "Pullback", "Reversal", "Trend Following", "Range", "News"]
+WORDS = ("entry late stop hit target plan fomo patience news spike range break retest london ny "
+         "asia open close trend pullback wick liquidity sweep risk size moved early followed").split()
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+MAX_CHART_POINTS = 1000  # comme l'app
+PAGE_SIZE = 50           # cartes par page (vue Journal)
+
+
+def parse_sizes(text: str) -> list:
+    """"1k,100k,1M" -> [1000, 100000, 1000000]."""
+    sizes = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        try:
+            sizes.append(int(float(part.rstrip("km")) * SUFFIXES.get(part[-1:], 1)))
+        except ValueError:
+            raise SystemExit(f"--sizes invalide: {part!r} (ex. 1k,100k,1M)")
+    return sizes
+
+
+def make_trades(rows: int, tickers: int = 12, sessions=("Asia", "London", "NY"),
+                start: str = "2020-01-01", days: int = 1825, note_len: int = 80,
+                seed: int = 0) -> pd.DataFrame:
+    """`rows` trades synthétiques triés par date, tels que relus d'un
+    trades.csv (date / heure en texte, nombres en float64). Notes de
+    ~`note_len` caractères (0 = aucune), un tiers vides."""
+    rng = np.random.default_rng(seed)
+    names = (BASE_TICKERS + [f"SYM{i}" for i in range(len(BASE_TICKERS), tickers)])[:tickers]
+    day = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit="D")
+    minute = pd.Series(rng.integers(0, 24 * 60, rows))
+    side = rng.choice(["Long", "Short"], rows)
+    qty = rng.choice([0.01, 0.1, 0.5, 1.0, 2.0, 5.0], rows)
+    entry = rng.uniform(1.0, 2000.0, rows).round(2)
+    exit_ = (entry * (1 + rng.normal(0.0, 0.004, rows))).round(2)
+    if note_len:
+        words = lambda: max(1, int(rng.normal(note_len, note_len / 3)) // 6)
+        pool = [" ".join(rng.choice(WORDS, words())) for _ in range(1024)] + [""] * 512
+        notes = np.array(pool, dtype=object)[rng.integers(0, len(pool), rows)]
+    else:
+        notes = np.full(rows, "", dtype=object)
+    df = pd.DataFrame({
+        "id": "b" + pd.Series(np.arange(rows)).astype(str),
+        "date": day.strftime("%Y-%m-%d"),
+        "time": (minute // 60).astype(str).str.zfill(2) + ":" + (minute % 60).astype(str).str.zfill(2),
+        "session": rng.choice(list(sessions), rows).astype(object),
+        "ticker": rng.choice(names, rows).astype(object),
+        "side": side.astype(object),
+        "quantity": qty,
+        "entry": entry,
+        "exit": exit_,
+        "strategy": rng.choice(STRATEGIES, rows).astype(object),
+        "notes": notes,
+        "result_usd": ((exit_ - entry) * np.where(side == "Long", 1.0, -1.0) * qty).round(2),
+    })
+    return df[TRADE_COLUMNS]
+
+
+def timed(fn, repeat: int, setup=None) -> dict:
+    """Meilleur / médian de `repeat` exécutions (setup non chronométré)."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best": round(min(runs), 6), "median": round(statistics.median(runs), 6), "runs": len(runs)}
+
+
+def run_size(rows: int, args) -> dict:
+    """Toutes les étapes pour un journal de `rows` trades."""
+    t0 = time.perf_counter()
+    raw = make_trades(rows, args.tickers, args.sessions.split(","), args.start, args.days, args.note_len, args.seed)
+    stages = {"generate": {"best": round(time.perf_counter() - t0, 6), "median": None, "runs": 1}}
+    r = args.repeat
+
+    frames = []  # coerce_trades_schema convertit sur place: une copie brute par run
+    stages["coerce"] = timed(lambda: coerce_trades_schema(frames.pop()), r, setup=lambda: frames.append(raw.copy()))
+    df = coerce_trades_schema(raw)
+    stages["save"] = timed(lambda: storage.save_trades(df), r)
+    stages["load_cold"] = timed(storage.load_trades, r, setup=storage.clear_data_cache)
+    stages["load_warm"] = timed(storage.load_trades, r)
+    stages["aggregates"] = timed(lambda: storage.rebuild_aggregates(df[PROGRESS_COLUMNS]), r)
+    agg = storage.load_aggregates()
+
+    # filtres Progress: la moitié centrale de la période, deux paires
+    dates = df["date"].dropna()
+    start, end = (dates.quantile(0.25).date(), dates.quantile(0.75).date()) if len(dates) else (None, None)
+    pairs = sorted(df["ticker"].dropna().unique().tolist())[:2]
+    # trades déjà en cache comme dans l'app; en SQLite le résultat de la
+    # requête est lui-même en cache: on le vide à chaque run
+    stages["filter_progress"] = timed(lambda: storage.query_trades(start, end, pairs), r,
+                                      setup=storage.clear_data_cache if storage.STORAGE_ENGINE == "sqlite" else None)
+    # vue Journal: index des filtres, puis un filtre combiné
+    stages["filter_index"] = timed(lambda: build_filter_index(df), r)
+    index = build_filter_index(df)
+    stages["filter_view"] = timed(lambda: filter_rows(index, contains={"ticker": "USD"},
+                                                      side="Long", strategy="Breakout"), r)
+
+    window = filter_buckets(agg, start, end, pairs)
+    stages["kpis"] = timed(lambda: (kpis_from_buckets(window), trade_stats(df["result_usd"])), r)
+    daily_pl = agg.groupby("date")["pnl"].sum()
+    stages["equity"] = timed(lambda: (series_from_buckets(agg), drawdown_stats(daily_pl),
+                                      ratio_stats(daily_pl)), r)
+    # pack de risque complet, filtre de paires compris (analytics.risk_metrics)
+    stages["risk"] = timed(lambda: analytics.risk_metrics(start, end, pairs), r,
+                           setup=lambda: (storage.clear_data_cache(), analytics._risk_metrics_cached.clear()))
+    series = series_from_buckets(agg)
+    stages["chart_prep"] = timed(lambda: (lttb_frame(series["equity"], "date", "Equity", MAX_CHART_POINTS),
+                                          minmax_series(series["weekly"], MAX_CHART_POINTS),
+                                          minmax_series(series["monthly"], MAX_CHART_POINTS)), r)
+    stages["cards_page"] = timed(lambda: cards_html(df.iloc[:PAGE_SIZE]), r)
+
+    mem = memory_usage(df)
+    return {"rows": rows, "stages": stages,
+            "memory": {k: mem[k] for k in ("bytes", "bytes_per_row", "mb_per_million_rows")}}
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    return {"revision": _git_revision(), "python": platform.python_version(), "pandas": pd.__version__,
+            "numpy": np.__version__, "platform": platform.platform(), "storage": storage.STORAGE_ENGINE,
+            "partition": storage.PARTITION_MODE, "wal": storage.WAL_ENABLED}
+
+
+def compare(old: dict, new: dict, tolerance: float) -> tuple:
+    """Lignes (rows, étape, avant, après, ratio) + régressions (ratio > tolerance)."""
+    before = {(s["rows"], name): st["best"] for s in old["results"] for name, st in s["stages"].items()}
+    lines, regressions = [], []
+    for size in new["results"]:
+        for name, st in size["stages"].items():
+            prev = before.get((size["rows"], name))
+            if name == "generate" or not prev:
+                continue
+            ratio = st["best"] / prev
+            lines.append((size["rows"], name, prev, st["best"], ratio))
+            if ratio > tolerance:
+                regressions.append((size["rows"], name, ratio))
+    return lines, regressions
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the journal's load/save/filter/aggregate paths.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"journal sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, best is kept (default: 3)")
+    parser.add_argument("--tickers", type=int, default=12, help="distinct tickers (default: 12)")
+    parser.add_argument("--sessions", default="Asia,London,NY", help="comma-separated sessions")
+    parser.add_argument("--start", default="2020-01-01", help="first trade date (default: 2020-01-01)")
+    parser.add_argument("--days", type=int, default=1825, help="date span in days (default: 1825)")
+    parser.add_argument("--note-len", type=int, default=80, help="mean note length, 0 = no notes (default: 80)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+    sizes = parse_sizes(args.sizes)
+    out = Path(args.out).resolve() if args.out else None
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+
+    report = {"created": pd.Timestamp.now().isoformat(timespec="seconds"), "environment": environment(),
+              "config": {k: getattr(args, k) for k in ("repeat", "tickers", "sessions", "start", "days",
+                                                       "note_len", "seed")},
+              "results": []}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="journal-bench-") as tmp:
+        os.chdir(tmp)  # data/ du banc, jamais celui de l'utilisateur
+        try:
+            for rows in sizes:
+                result = run_size(rows, args)
+                report["results"].append(result)
+                print(f"--- {rows:,} rows ({result['memory']['bytes_per_row']} B/row in memory)")
+                for name, st in result["stages"].items():
+                    print(f"  {name:<16}{st['best'] * 1000:>12.2f} ms")
+                storage.clear_data_cache()
+        finally:
+            os.chdir(cwd)
+
+    if out:
+        out.write_text(json.dumps(report, indent=2))
+        print(f"results written to {out}")
+    if baseline:
+        lines, regressions = compare(baseline, report, args.tolerance)
+        print(f"--- vs {args.compare} (revision {baseline['environment'].get('revision')})")
+        for rows, name, prev, now, ratio in lines:
+            flag = "  <-- slower" if ratio > args.tolerance else ""
+            print(f"  {rows:>10,} {name:<16}{prev * 1000:>10.2f} ->{now * 1000:>10.2f} ms  x{ratio:.2f}{flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# downsample.py — réduction du nombre de points envoyés aux graphiques
+# -----------------------------------------------------------
+# - LTTB (Largest-Triangle-Three-Buckets) pour les courbes (equity):
+#   garde la forme, les sommets et les creux de drawdown
+# - min/max par tranche pour les barres (weekly/monthly): garde les extrêmes
+# Pas de dépendance à Streamlit: utilisable par app.py et app_backup_*.py
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(values) -> np.ndarray:
+    """Dates -> nanosecondes (float) pour pouvoir calculer des aires."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype=float)
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+
+def lttb_indices(x, y, max_points: int) -> np.ndarray:
+    """Positions des points retenus par LTTB (toujours le premier et le dernier)."""
+    x = _as_float(x); y = _as_float(y)
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    every = (n - 2) / (max_points - 2)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nxt_lo, nxt_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def lttb_frame(df: pd.DataFrame, x_col: str, y_col: str, max_points: int) -> pd.DataFrame:
+    """Sous-échantillonne une courbe (df trié par x_col) à max_points lignes."""
+    if len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(df[x_col], df[y_col], max_points)]
+
+
+def lttb_series(s: pd.Series, max_points: int) -> pd.Series:
+    """Même chose pour une Series dont l'index sert d'axe X."""
+    if len(s) <= max_points:
+        return s
+    x = s.index if isinstance(s.index, pd.DatetimeIndex) else np.arange(len(s))
+    return s.iloc[lttb_indices(x, s.to_numpy(), max_points)]
+
+
+def minmax_series(s: pd.Series, max_points: int) -> pd.Series:
+    """Barres: découpe en max_points/2 tranches et garde le min et le max de chacune."""
+    if len(s) <= max_points or max_points < 2:
+        return s
+    values = s.fillna(0.0).to_numpy(dtype=float)
+    buckets = np.array_split(np.arange(len(s)), max_points // 2)
+    keep = set()
+    for b in buckets:
+        keep.add(b[np.argmin(values[b])])
+        keep.add(b[np.argmax(values[b])])
+    return s.iloc[sorted(keep)]
@@ -0,0 +1,197 @@
+# import_trades.py — import en masse d'exports broker (sans Streamlit)
+# -----------------------------------------------------------
+# Usage:
+#   python import_trades.py export.csv [--chunksize 50000] [--map Symbol=ticker]
+#                           [--rejects rejects.csv] [--dry-run] [--journal alice [--create]]
+# - lecture par morceaux (mémoire bornée), colonnes broker -> TRADE_COLUMNS
+# - validation vectorisée par morceau (même typage que coerce_trades_schema)
+# - dédoublonnage sur l'id, sinon sur une clé naturelle (date, heure, ticker…)
+# - ajout en bloc dans le stockage du journal (append_trades), un par morceau;
+#   feather / parquet non partitionné: un seul à la fin (chaque ajout y
+#   réécrit tout le fichier)
+# - lignes rejetées -> CSV avec une colonne "reason"
+# - --dry-run ne touche pas au journal (pas même pour le créer)
+# -----------------------------------------------------------
+
+import argparse
+import hashlib
+import sys
+
+import pandas as pd
+
+from journal_core.schema import TRADE_COLUMNS, coerce_trades_schema
+from journal_core.storage import (DEFAULT_JOURNAL, PARTITIONED, STORAGE_ENGINE, TYPED_ENGINES, append_trades,
+                                  create_journal, list_journals, load_trades, peek_trades, use_journal)
+
+# Noms de colonnes fréquents dans les exports broker (minuscules, sans espaces)
+COLUMN_ALIASES = {
+    "trade_id": "id", "ticket": "id", "order_id": "id", "deal": "id",
+    "symbol": "ticker", "instrument": "ticker", "pair": "ticker", "market": "ticker",
+    "direction": "side", "type": "side", "action": "side",
+    "qty": "quantity", "size": "quantity", "lots": "quantity", "volume": "quantity",
+    "entry_price": "entry", "open_price": "entry", "price_open": "entry",
+    "exit_price": "exit", "close_price": "exit", "price_close": "exit",
+    "pnl": "result_usd", "p&l": "result_usd", "profit": "result_usd", "net_pnl": "result_usd",
+    "comment": "notes", "setup": "strategy",
+    "open_time": "datetime", "timestamp": "datetime", "time_open": "datetime",
+}
+SIDE_ALIASES = {"buy": "Long", "long": "Long", "b": "Long", "sell": "Short", "short": "Short", "s": "Short"}
+NATURAL_KEY = ["date", "time", "ticker", "side", "quantity", "entry", "exit"]
+
+
+def parse_mapping(pairs: list) -> dict:
+    """--map Source=cible (répétable) -> {"source": "cible"}."""
+    mapping = {}
+    for pair in pairs or []:
+        src, sep, dst = pair.partition("=")
+        if not sep or dst not in TRADE_COLUMNS + ["datetime"]:
+            raise SystemExit(f"--map invalide: {pair!r} (attendu Source=colonne du journal)")
+        mapping[src.strip().lower()] = dst
+    return mapping
+
+
+def map_columns(chunk: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    """Renomme les colonnes broker vers TRADE_COLUMNS (priorité à --map)."""
+    names = {}
+    for col in chunk.columns:
+        key = str(col).strip().lower().replace(" ", "_")
+        dst = mapping.get(str(col).strip().lower(), mapping.get(key))
+        if dst is None:
+            dst = key if key in TRADE_COLUMNS else COLUMN_ALIASES.get(key)
+        if dst and dst not in names.values():
+            names[col] = dst
+    chunk = chunk[list(names)].rename(columns=names)
+    if "datetime" in chunk:
+        stamp = pd.to_datetime(chunk.pop("datetime"), errors="coerce")
+        if "date" not in chunk: chunk["date"] = stamp.dt.date
+        if "time" not in chunk: chunk["time"] = stamp.dt.strftime("%H:%M").fillna("")
+    return chunk
+
+
+def natural_keys(df: pd.DataFrame) -> pd.Series:
+    """Clé naturelle d'un trade (même trade exporté deux fois = même clé)."""
+    parts = []
+    for c in NATURAL_KEY:
+        col = df[c]
+        if c in ("quantity", "entry", "exit"):
+            col = col.round(8)
+        parts.append(col.astype(str).str.strip().str.upper())
+    key = parts[0]
+    for p in parts[1:]:
+        key = key + "|" + p
+    return key
+
+
+def validate_chunk(chunk: pd.DataFrame) -> tuple:
+    """Typage + contrôles vectorisés. Renvoie (acceptés, motif de rejet par ligne)."""
+    df = coerce_trades_schema(chunk.copy())
+    # colonnes texte / catégories nettoyées en str (re-typées par append_trades)
+    for c in ["ticker", "session", "strategy", "notes", "time", "id", "side"]:
+        df[c] = df[c].astype(str).replace({"nan": "", "None": "", "NaT": "", "<NA>": ""}).str.strip()
+    df["ticker"] = df["ticker"].str.upper()
+    df["side"] = df["side"].str.lower().map(SIDE_ALIASES).fillna(df["side"])
+    df["result_usd"] = df["result_usd"].fillna(0.0)
+
+    reason = pd.Series("", index=df.index)
+    checks = [
+        (df["date"].isna(), "invalid date"),
+        (df["ticker"] == "", "missing ticker"),
+        (~df["side"].isin(["Long", "Short"]), "invalid side"),
+        (~(df["quantity"] > 0), "quantity <= 0"),
+        (~(df["entry"] > 0), "entry <= 0"),
+        (~(df["exit"] > 0), "exit <= 0"),
+    ]
+    for mask, why in checks:
+        reason = reason.mask(mask & (reason == ""), why)
+    bad = reason != ""
+    return df[~bad], reason[bad]
+
+
+def fill_ids(df: pd.DataFrame, keys: pd.Series) -> pd.DataFrame:
+    """Id stable quand l'export n'en fournit pas: 'imp-' + sha1(clé naturelle).
+    Réimporter le même fichier donne donc les mêmes ids."""
+    missing = df["id"] == ""
+    if missing.any():
+        df = df.copy()
+        df.loc[missing, "id"] = [
+            "imp-" + hashlib.sha1(k.encode("utf-8")).hexdigest()[:12] for k in keys[missing]
+        ]
+    return df
+
+
+def _seen(values: pd.Series, seen: set) -> pd.Series:
+    """Appartenance à un set Python (Series.isin reconvertit le set à chaque appel)."""
+    return pd.Series([v in seen for v in values], index=values.index, dtype=bool)
+
+
+def import_file(path: str, chunksize: int = 50_000, mapping: dict | None = None,
+                rejects_path: str | None = None, dry_run: bool = False, sep: str = ",") -> dict:
+    """Importe `path` morceau par morceau. Renvoie les compteurs du rapport.
+    `dry_run`: doublons comptés d'après les trades déjà sur disque, rien n'est écrit."""
+    existing = (peek_trades if dry_run else load_trades)(columns=TRADE_COLUMNS)
+    seen_ids = set(existing["id"])
+    seen_keys = set(natural_keys(existing)) if not existing.empty else set()
+    del existing
+
+    stats = {"read": 0, "accepted": 0, "duplicates": 0, "rejected": 0}
+    rejects_written = False
+    held = [] if STORAGE_ENGINE in TYPED_ENGINES and not PARTITIONED else None  # sinon coût quadratique
+    for chunk in pd.read_csv(path, chunksize=chunksize, sep=sep, dtype=str, keep_default_na=False):
+        stats["read"] += len(chunk)
+        ok, reason = validate_chunk(map_columns(chunk, mapping or {}))
+
+        keys = natural_keys(ok)
+        ok = fill_ids(ok, keys)
+        dup = _seen(ok["id"], seen_ids) | _seen(keys, seen_keys)
+        dup |= ok["id"].duplicated() | keys.duplicated()
+        stats["rejected"] += len(reason)
+        stats["duplicates"] += int(dup.sum())
+        reason = pd.concat([reason, pd.Series("duplicate", index=dup[dup].index)])
+        ok, keys = ok[~dup], keys[~dup]
+        seen_ids.update(ok["id"]); seen_keys.update(keys)
+        stats["accepted"] += len(ok)
+        if not dry_run and not ok.empty:
+            if held is not None:
+                held.append(ok[TRADE_COLUMNS])
+            else:
+                append_trades(ok[TRADE_COLUMNS], compact=False)
+        if rejects_path and not reason.empty:
+            rejects = chunk.loc[reason.index].assign(reason=reason).sort_index()
+            rejects.to_csv(rejects_path, mode="a" if rejects_written else "w",
+                           header=not rejects_written, index=False)
+            rejects_written = True
+    if held:
+        append_trades(pd.concat(held, ignore_index=True), compact=False)
+    return stats
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import of broker trade exports into the journal.")
+    parser.add_argument("csv", help="broker export (CSV)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows per chunk (default: 50000)")
+    parser.add_argument("--map", action="append", metavar="SRC=DST",
+                        help="map a broker column to a journal column (repeatable)")
+    parser.add_argument("--sep", default=",", help="field separator (default: ,)")
+    parser.add_argument("--rejects", help="write rejected / duplicate rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, do not write")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="target journal (default: data/)")
+    parser.add_argument("--create", action="store_true", help="create --journal if it does not exist")
+    args = parser.parse_args(argv)
+
+    if args.journal not in list_journals():
+        if not args.create:
+            parser.error(f"unknown journal {args.journal!r} (existing: {', '.join(list_journals())}); "
+                         "use --create to create it")
+        if not args.dry_run:
+            create_journal(args.journal)
+    with use_journal(args.journal):
+        stats = import_file(args.csv, args.chunksize, parse_mapping(args.map),
+                            args.rejects, args.dry_run, args.sep)
+    print("read={read} accepted={accepted} duplicates={duplicates} rejected={rejected}".format(**stats))
+    if args.dry_run:
+        print("dry run: nothing written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+# journal_core — cœur du Trading Journal, sans Streamlit
+# -----------------------------------------------------------
+# - schema.py  : colonnes + typage des trades / notes du jour
+# - storage.py : moteurs de stockage (csv, feather, parquet, sqlite), cache,
+#                écritures par id, agrégats de la page Progress, journaux
+# - wal.py     : journal d'écriture anticipée (segments, checkpoints)
+# - snapshots.py: sauvegardes dédoublonnées, restauration, Reset
+# - search.py  : index plein texte des notes (SQLite FTS5)
+# - analytics.py: KPIs, equity, totaux hebdo / mensuels (page Progress)
+# - trade_math.py: PnL, R:R prévu / réalisé, R-multiple sur des colonnes
+# - filter_index.py: bitmaps tags / catégories des filtres (vue Notion)
+# - cards.py   : cartes HTML de la vue Notion, par page et par colonnes
+# - trace.py   : spans de chronométrage d'un rerun (panneau Performance)
+# - warmup.py  : préchauffage de la page Progress après chaque écriture
+# Importable depuis un script ou un job (ex. import_trades.py).
+# -----------------------------------------------------------
@@ -0,0 +1,158 @@
+# analytics.py — calculs de la page Progress (sans Streamlit ni Altair)
+# -----------------------------------------------------------
+# - KPIs (nb de trades, win rate, P/L), equity, totaux hebdo / mensuels
+# - tout part des buckets (jour, ticker) tenus à jour par storage.py:
+#   les fonctions *_from_buckets acceptent aussi des buckets calculés
+#   ailleurs (job batch, tests) sans toucher au stockage
+# - métriques de risque: drawdown (sur l'equity journalière triée par date),
+#   Sharpe / Sortino (P/L journalier), profit factor, espérance, séries
+# - résultats mis en cache par (filtres, version des agrégats): une écriture
+#   change la version, warmup.py recalcule la vue par défaut en arrière-plan
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from .storage import _memo, aggregates_version, load_aggregates, query_trades
+from .trace import traced
+
+TRADING_DAYS = 252  # annualisation de Sharpe / Sortino
+
+def filter_buckets(agg: pd.DataFrame, start=None, end=None, tickers=None) -> pd.DataFrame:
+    if start:   agg = agg[agg["date"] >= pd.Timestamp(start)]
+    if end:     agg = agg[agg["date"] <= pd.Timestamp(end)]
+    if tickers: agg = agg[agg["ticker"].isin(tickers)]
+    return agg
+
+def kpis_from_buckets(agg: pd.DataFrame) -> dict:
+    """Nb de trades, gagnants, P/L total, première/dernière date."""
+    return {"total": int(agg["count"].sum()), "wins": int(agg["wins"].sum()), "pnl": float(agg["pnl"].sum()),
+            "first": agg["date"].min().date() if not agg.empty else None,
+            "last": agg["date"].max().date() if not agg.empty else None}
+
+def series_from_buckets(agg: pd.DataFrame) -> dict:
+    """Equity (cumul par jour), totaux hebdo et mensuels."""
+    daily_pl = agg.groupby("date")["pnl"].sum().sort_index()
+    curve = daily_pl.cumsum().rename("Equity").reset_index()
+    weekly  = daily_pl.resample('W-MON').sum().rename("Weekly P/L ($)")
+    monthly = daily_pl.resample('MS').sum().rename("Monthly P/L ($)")
+    return {"equity": curve, "weekly": weekly, "monthly": monthly}
+
+def _tickers_key(tickers) -> tuple:
+    return tuple(sorted(tickers)) if tickers else ()
+
+@_memo(max_entries=64)
+def _trade_kpis_cached(start, end, tickers: tuple, version: tuple) -> dict:
+    return kpis_from_buckets(filter_buckets(load_aggregates(), start, end, tickers))
+
+@_memo(max_entries=4)
+def _trade_tickers_cached(version: tuple) -> list:
+    return sorted(load_aggregates()["ticker"].dropna().unique().tolist())
+
+@_memo(max_entries=32)
+def _progress_series_cached(start, end, tickers: tuple, version: tuple) -> dict:
+    return series_from_buckets(filter_buckets(load_aggregates(), start, end, tickers))
+
+@traced("aggregate.kpis")
+def trade_kpis(start=None, end=None, tickers=None) -> dict:
+    """KPIs du journal, limités à la période / aux paires demandées."""
+    return _trade_kpis_cached(start, end, _tickers_key(tickers), aggregates_version())
+
+@traced("aggregate.tickers")
+def trade_tickers() -> list:
+    return _trade_tickers_cached(aggregates_version())
+
+@traced("aggregate.series")
+def progress_series(start=None, end=None, tickers=None) -> dict:
+    series = _progress_series_cached(start, end, _tickers_key(tickers), aggregates_version())
+    return {k: v.copy() for k, v in series.items()}
+
+# ---------- Métriques de risque ----------
+# Chaque fonction fait une seule passe vectorisée sur des séries triées
+# par date; aucune boucle Python par trade ou par jour.
+def drawdown_stats(daily_pl: pd.Series) -> dict:
+    """Drawdowns de l'equity (cumul du P/L journalier, index = dates).
+    Le capital de départ (0) compte comme premier sommet. Un drawdown dure
+    du dernier sommet jusqu'au retour au sommet (ou jusqu'à la fin de la
+    période s'il n'est pas récupéré); la récupération se compte depuis le
+    creux. Montants en $, durées en jours calendaires."""
+    out = {"max_dd": 0.0, "avg_dd": 0.0, "max_dd_days": 0, "longest_dd_days": 0, "recovery_days": None}
+    daily_pl = daily_pl.sort_index()
+    equity = daily_pl.cumsum()
+    dd = equity - np.maximum(equity.cummax(), 0.0)
+    under = dd < 0
+    if not under.any():
+        return out
+    dates = pd.Series(daily_pl.index, index=daily_pl.index)
+    at_peak = dates.where(~under)
+    episodes = pd.DataFrame({
+        "episode": (under & ~under.shift(fill_value=False)).cumsum(),
+        "dd": dd,
+        "start": at_peak.ffill().fillna(dates.iloc[0]),   # dernier sommet avant le creux
+        "end": at_peak.bfill(),                           # retour au sommet (NaT = pas encore)
+    })[under]
+    g = episodes.groupby("episode")
+    depth = g["dd"].min()
+    start, end = g["start"].first(), g["end"].last()
+    trough = g["dd"].idxmin()   # index = dates -> date du creux de chaque épisode
+    duration = (end.fillna(dates.iloc[-1]) - start).dt.days
+    worst = depth.idxmin()
+    recovery = end[worst] - trough[worst]
+    out.update(max_dd=float(depth.min()), avg_dd=float(depth.mean()),
+               max_dd_days=int(duration[worst]), longest_dd_days=int(duration.max()),
+               recovery_days=None if pd.isna(recovery) else int(recovery.days))
+    return out
+
+def _longest_run(mask: np.ndarray) -> int:
+    """Plus longue suite de True consécutifs."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return int(runs.max()) if runs.size else 0
+
+def trade_stats(pl: pd.Series) -> dict:
+    """Profit factor, espérance, gain / perte moyens et plus longues séries
+    gagnantes / perdantes. `pl` = result_usd dans l'ordre chronologique;
+    un trade à 0 coupe les deux séries."""
+    pl = pd.to_numeric(pl, errors="coerce").dropna().to_numpy(dtype=float)
+    wins, losses = pl[pl > 0], pl[pl < 0]
+    gross_win, gross_loss = wins.sum(), -losses.sum()
+    return {
+        "profit_factor": (float(gross_win / gross_loss) if gross_loss > 0
+                          else (float("inf") if gross_win > 0 else None)),
+        "expectancy": float(pl.mean()) if pl.size else None,
+        "avg_win": float(wins.mean()) if wins.size else None,
+        "avg_loss": float(losses.mean()) if losses.size else None,
+        "win_streak": _longest_run(pl > 0),
+        "loss_streak": _longest_run(pl < 0),
+    }
+
+def ratio_stats(daily_pl: pd.Series, capital: float | None = None) -> dict:
+    """Sharpe et Sortino annualisés sur les rendements journaliers.
+    Les jours ouvrés sans trade comptent pour 0. Sans `capital`, on prend le
+    P/L journalier en $ (les ratios ne changent pas pour un capital fixe)."""
+    daily_pl = daily_pl.sort_index()
+    if len(daily_pl) < 2:
+        return {"sharpe": None, "sortino": None}
+    days = pd.bdate_range(daily_pl.index.min(), daily_pl.index.max())
+    r = daily_pl.groupby(daily_pl.index).sum().reindex(days.union(daily_pl.index), fill_value=0.0).to_numpy()
+    if capital:
+        r = r / capital
+    mean, std = r.mean(), r.std(ddof=1)
+    downside = np.sqrt(np.mean(np.minimum(r, 0.0) ** 2))
+    scale = np.sqrt(TRADING_DAYS)
+    return {"sharpe": float(mean / std * scale) if std > 0 else None,
+            "sortino": float(mean / downside * scale) if downside > 0 else None}
+
+@_memo(max_entries=32)
+def _risk_metrics_cached(start, end, tickers: tuple, version: tuple) -> dict:
+    daily_pl = filter_buckets(load_aggregates(), start, end, tickers).groupby("date")["pnl"].sum()
+    trades = query_trades(start, end, list(tickers), columns=["timestamp","result_usd"])
+    trades = trades.sort_values("timestamp", kind="stable")
+    return {**drawdown_stats(daily_pl), **ratio_stats(daily_pl), **trade_stats(trades["result_usd"])}
+
+@traced("aggregate.risk")
+def risk_metrics(start=None, end=None, tickers=None) -> dict:
+    """Pack complet pour la page Progress, sous les mêmes filtres que les KPIs:
+    drawdowns / ratios depuis les buckets journaliers, stats par trade depuis
+    les trades filtrés (timestamp et résultat seulement)."""
+    return _risk_metrics_cached(start, end, _tickers_key(tickers), aggregates_version())
@@ -0,0 +1,57 @@
+# cards.py — cartes HTML de la vue Journal (style Notion), par colonnes
+# -----------------------------------------------------------
+# Une page de trades -> UNE chaîne HTML, assemblée colonne par colonne
+# (opérations pandas / NumPy sur des Series), sans iterrows ni f-string par
+# ligne. L'appelant n'envoie que la page visible, en un seul élément:
+# le coût d'un rerun dépend de la taille de page, pas du nombre de trades.
+# Le texte saisi (ticker, tags, notes…) est échappé.
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+_ESCAPES = [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;")]
+
+
+def _text(df: pd.DataFrame, col: str, missing: str = "") -> pd.Series:
+    """Colonne -> texte HTML échappé (NaN / absente -> `missing`)."""
+    if col not in df:
+        return pd.Series(missing, index=df.index)
+    s = df[col].astype(object).astype(str).where(df[col].notna(), missing)
+    for raw, esc in _ESCAPES:
+        s = s.str.replace(raw, esc, regex=False)
+    return s
+
+
+def _num(df: pd.DataFrame, col: str, fmt: str = "%.2f") -> pd.Series:
+    """Nombre formaté en C (np.char.mod), NaN / absent -> 0."""
+    values = pd.to_numeric(df[col], errors="coerce").fillna(0.0).to_numpy(dtype=float) if col in df else np.zeros(len(df))
+    return pd.Series(np.char.mod(fmt, values), index=df.index)
+
+
+def _tags(df: pd.DataFrame) -> pd.Series:
+    """"London, NY" -> <span class="tag">London</span> <span class="tag">NY</span>."""
+    tags = _text(df, "tags").str.replace(r"\s*,\s*", ",", regex=True).str.strip(", ")
+    tags = tags.str.replace(r",+", ",", regex=True)
+    html = '<span class="tag">' + tags.str.replace(",", '</span> <span class="tag">', regex=False) + "</span>"
+    return html.where(tags != "", "")
+
+
+def cards_html(df: pd.DataFrame) -> str:
+    """HTML de toutes les cartes de `df` (déjà filtré, trié et paginé)."""
+    if df.empty:
+        return ""
+    notes = _text(df, "notes").str.strip().str.replace("\r\n", "\n", regex=False).str.replace("\n", "<br>", regex=False)
+    cards = (
+        '<div class="card"><h4>' + _text(df, "ticker") + " · " + _text(df, "side")
+        + ' · <span class="badge">' + _text(df, "strategy") + "</span></h4>"
+        + '<div class="meta">' + _text(df, "date") + " " + _text(df, "time")
+        + " · Mood " + _text(df, "mood") + " · Conf " + _num(df, "confidence", "%d")
+        + "% · RR plan " + _num(df, "rr_planned") + " · R " + _num(df, "r_multiple") + "</div>"
+        + '<div style="margin:8px 0;">' + _tags(df) + "</div>"
+        + '<div class="meta">Entry ' + _text(df, "entry", "–") + " · Stop " + _text(df, "stop", "–")
+        + " · Target " + _text(df, "target", "–") + " · Exit " + _text(df, "exit", "–")
+        + " · Qty " + _text(df, "quantity", "–") + " · PnL <b>" + _num(df, "pnl") + "</b></div>"
+        + '<div style="margin-top:10px; white-space:pre-wrap;">' + notes + "</div></div>"
+    )
+    return "".join(cards.tolist())
@@ -0,0 +1,90 @@
+# filter_index.py — index des filtres de la vue Journal (style Notion)
+# -----------------------------------------------------------
+# - tags "London,NY" découpés une fois: tag -> bitmap des lignes (bits
+#   compactés, 1 bit par trade). Correspondance exacte, sans casse:
+#   "NY" ne trouve plus "NYC"
+# - strategy / side / ticker en catégories: une valeur -> bitmap calculé
+#   sur les codes entiers (puis gardé), jamais sur les chaînes
+# - filtres combinés = ET binaire des bitmaps, sans copie du DataFrame
+# Coût d'un filtre ~ nb de lignes / 8 octets: il reste plat quand le
+# journal grossit. L'index se construit sur un DataFrame figé (positions).
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ("strategy", "side", "ticker")
+
+
+def split_tags(tags: pd.Series) -> pd.Series:
+    """"London, NY" -> une ligne par tag (index = position du trade)."""
+    out = tags.fillna("").astype(str).reset_index(drop=True).str.split(",").explode().str.strip()
+    return out[(out != "") & (out.str.lower() != "nan")]
+
+
+def build_filter_index(df: pd.DataFrame, tag_column: str = "tags",
+                       columns: tuple = CATEGORY_COLUMNS) -> dict:
+    """{"rows", "tags": {clé: bitmap}, "tag_names": {clé: libellé},
+    "columns": {colonne: Categorical}, "bitmaps": cache valeur -> bitmap}."""
+    n = len(df)
+    index = {"rows": n, "tags": {}, "tag_names": {}, "columns": {}, "bitmaps": {}}
+    if tag_column in df:
+        # peu de combinaisons distinctes ("London,NY"...): on ne découpe
+        # qu'elles, puis tag -> combinaisons -> lignes via les codes
+        codes, combos = pd.factorize(df[tag_column].astype(object).fillna("").astype(str))
+        tags = split_tags(pd.Series(combos, dtype=object))
+        keys = tags.str.casefold()
+        index["tag_names"] = tags.groupby(keys).first().to_dict()  # premier libellé rencontré
+        for key, combo_pos in keys.groupby(keys).groups.items():
+            index["tags"][key] = np.packbits(np.isin(codes, np.asarray(combo_pos)))
+    for col in columns:
+        if col in df:
+            index["columns"][col] = pd.Categorical(df[col].astype(object).fillna("").astype(str))
+    return index
+
+
+def tag_names(index: dict) -> list:
+    return sorted(index["tag_names"].values(), key=str.casefold)
+
+
+def column_values(index: dict, column: str) -> list:
+    cat = index["columns"].get(column)
+    return list(cat.categories) if cat is not None else []
+
+
+def _empty(index: dict) -> np.ndarray:
+    return np.zeros((index["rows"] + 7) // 8, dtype=np.uint8)
+
+
+def _codes_bitmap(index: dict, column: str, codes: np.ndarray) -> np.ndarray:
+    cat = index["columns"].get(column)
+    if cat is None or not len(codes):
+        return _empty(index)
+    return np.packbits(np.isin(cat.codes, codes))
+
+
+def _equals_bitmap(index: dict, column: str, value: str) -> np.ndarray:
+    key = (column, value)
+    if key not in index["bitmaps"]:
+        cat = index["columns"].get(column)
+        codes = [cat.categories.get_loc(value)] if cat is not None and value in cat.categories else []
+        index["bitmaps"][key] = _codes_bitmap(index, column, np.asarray(codes, dtype=int))
+    return index["bitmaps"][key]
+
+
+def filter_rows(index: dict, tags=(), contains: dict | None = None, **equals) -> np.ndarray:
+    """Positions (croissantes) des lignes qui ont TOUS les `tags`, dont les
+    colonnes valent `equals` (None ou "All" = pas de filtre) et contiennent
+    le texte de `contains` ({colonne: texte}, sans casse)."""
+    masks = [index["tags"].get(str(t).strip().casefold(), _empty(index)) for t in tags]
+    for column, value in equals.items():
+        if value not in (None, "", "All"):
+            masks.append(_equals_bitmap(index, column, str(value)))
+    for column, text in (contains or {}).items():
+        if text:
+            cat = index["columns"].get(column)
+            hits = np.flatnonzero(cat.categories.str.contains(text, case=False, regex=False)) if cat is not None else []
+            masks.append(_codes_bitmap(index, column, np.asarray(hits, dtype=int)))
+    if not masks:
+        return np.arange(index["rows"])
+    return np.flatnonzero(np.unpackbits(np.bitwise_and.reduce(masks), count=index["rows"]))
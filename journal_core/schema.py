@@ -0,0 +1,138 @@
+# schema.py — colonnes et typage des données du journal
+# -----------------------------------------------------------
+# Même schéma pour tous les moteurs de stockage: trades.csv et daily.csv
+# restent la référence (import / export).
+# Trades en mémoire, représentation compacte:
+# - date en datetime64 (filtres = comparaisons vectorisées, pas d'objets date)
+# - timestamp = date + time en datetime64 (tri chronologique natif), calculé
+#   au chargement et jamais stocké: les fichiers gardent date et time
+# - session / ticker / side / strategy en catégories (1 code par ligne)
+# - nombres en float64: les prix saisis (4 décimales, ex. 104523.4567)
+#   doivent revenir intacts dans le stockage à chaque réécriture
+# - notes en chaînes Arrow (si pyarrow est installé, c'est le cas avec streamlit)
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (installé avec streamlit)
+    NOTES_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    NOTES_DTYPE = None  # chaînes Python
+
+TRADE_COLUMNS = [
+    "id","date","time","session","ticker","side",
+    "quantity","entry","exit","strategy","notes",
+    "result_usd"
+]
+DAILY_COLUMNS = [
+    "date","mood","confidence","day_type","day_result","day_pl","sessions",
+    "day_notes","lesson","checklist_ok","screenshot_path"
+]
+TRADE_FRAME_COLUMNS = TRADE_COLUMNS + ["timestamp"]  # représentation en mémoire
+TRADE_NUMERIC_COLUMNS = ["quantity","entry","exit","result_usd"]
+TRADE_CATEGORY_COLUMNS = ["session","ticker","side","strategy"]
+DAILY_TEXT_COLUMNS = ["mood","day_type","day_result","sessions","day_notes","lesson","screenshot_path"]
+PROGRESS_COLUMNS = ["date","ticker","result_usd"]  # seules colonnes utiles aux stats
+
+def _trade_dtype(col: str):
+    if col in ("date", "timestamp"):
+        return "datetime64"
+    if col in TRADE_CATEGORY_COLUMNS:
+        return "category"
+    if col in TRADE_NUMERIC_COLUMNS:
+        return np.float64
+    return NOTES_DTYPE if col == "notes" and NOTES_DTYPE is not None else str
+
+def _has_dtype(s: pd.Series, dtype) -> bool:
+    if dtype == "datetime64":
+        return pd.api.types.is_datetime64_dtype(s.dtype)
+    if dtype == "category":
+        return isinstance(s.dtype, pd.CategoricalDtype)
+    if dtype is str:
+        return False  # objet / str: on ne peut pas savoir sans tout parcourir
+    return s.dtype == dtype
+
+def stored_columns(columns: list | None) -> list | None:
+    """Colonnes à lire dans le stockage pour obtenir `columns` (timestamp -> date, time)."""
+    if not columns or "timestamp" not in columns:
+        return columns
+    return list(dict.fromkeys(c for col in columns for c in (["date", "time"] if col == "timestamp" else [col])))
+
+def trade_timestamps(df: pd.DataFrame) -> pd.Series:
+    """date + time ("HH:MM" ou "HH:MM:SS") -> datetime64, vectorisé (heure
+    absente ou illisible = minuit). Les heures distinctes (au plus 86 400)
+    sont analysées une seule fois."""
+    date = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+    if "time" not in df:
+        return date
+    codes, uniques = pd.factorize(df["time"].astype(str).str.strip())
+    uniques = pd.Series(uniques, dtype=object)
+    uniques = uniques.where(uniques.str.count(":") != 1, uniques + ":00")
+    offsets = pd.to_timedelta(uniques, errors="coerce").fillna(pd.Timedelta(0)).to_numpy()
+    time = offsets[codes] if len(offsets) else np.zeros(len(df), dtype="timedelta64[ns]")
+    return date + pd.to_timedelta(time)
+
+def coerce_trades_schema(df: pd.DataFrame, columns: list | None = None) -> pd.DataFrame:
+    """Garantit que trades.csv a les bonnes colonnes + bons types (voir en-tête),
+    plus timestamp (date + time) s'il est demandé (par défaut: oui).
+    `columns` limite le travail (et le résultat) à une projection.
+    Une colonne déjà au bon type (feather / parquet, frame déjà typée) n'est
+    pas reconvertie."""
+    columns = columns or TRADE_FRAME_COLUMNS
+    for col in stored_columns(columns):
+        if col not in df.columns:
+            df[col] = 0.0 if col in TRADE_NUMERIC_COLUMNS else ""
+    for c in columns:
+        dtype = _trade_dtype(c)
+        if c == "timestamp":
+            if c not in df or not _has_dtype(df[c], dtype):
+                df[c] = trade_timestamps(df)
+            continue
+        if _has_dtype(df[c], dtype):
+            continue
+        if dtype == "datetime64":
+            df[c] = pd.to_datetime(df[c], errors="coerce").dt.normalize()
+        elif dtype == "category":
+            df[c] = df[c].astype(str).astype("category")
+        elif c in TRADE_NUMERIC_COLUMNS:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(dtype)
+        else:
+            df[c] = df[c].astype(str).astype(dtype)
+    return df[columns]
+
+def memory_usage(df: pd.DataFrame) -> dict:
+    """Mémoire réelle (deep) du frame: total, par ligne, projetée pour 1M
+    de trades, et par colonne (octets)."""
+    cols = df.memory_usage(deep=True, index=False)
+    total = int(cols.sum())
+    per_row = total / len(df) if len(df) else 0.0
+    return {"rows": len(df), "bytes": total, "bytes_per_row": round(per_row, 1),
+            "mb_per_million_rows": round(per_row * 1e6 / 2**20, 1),
+            "columns": {c: int(v) for c, v in cols.items()}}
+
+def unique_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """Rend la colonne id unique (anciens CSV importés deux fois: ex1, ex1...).
+    Les doublons sont renommés id-2, id-3… plutôt que supprimés."""
+    if df.empty or not df["id"].duplicated().any():
+        return df
+    df = df.copy()
+    n = df.groupby("id").cumcount()
+    df.loc[n > 0, "id"] = df.loc[n > 0, "id"] + "-" + (n[n > 0] + 1).astype(str)
+    return df
+
+def coerce_daily_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Même chose pour daily.csv."""
+    if df.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    if "date" in df: df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+    for c in ["confidence","day_pl"]:
+        if c in df: df[c] = pd.to_numeric(df[c], errors="coerce")
+    for c in DAILY_TEXT_COLUMNS:
+        if c in df: df[c] = df[c].astype(str)
+    if "checklist_ok" in df: df["checklist_ok"] = df["checklist_ok"].fillna(False).astype(bool)
+    for col in DAILY_COLUMNS:
+        if col not in df.columns:
+            df[col] = "" if col in DAILY_TEXT_COLUMNS else 0
+    return df[DAILY_COLUMNS]
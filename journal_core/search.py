@@ -0,0 +1,176 @@
+# search.py — recherche plein texte dans les notes du journal
+# -----------------------------------------------------------
+# Index SQLite FTS5 (stdlib) dans <journal>/search.db:
+# - docs : un document par trade (notes) ou par jour (day_notes + lesson),
+#          avec sa clé (id du trade / date), sa date et sa paire
+# - fts  : index inversé du texte (mots sans accents, préfixes 2-3 lettres)
+# Mise à jour incrémentale: l'index retient le dernier seq du WAL qu'il a
+# appliqué et ne rejoue que les mutations suivantes (ajouts, éditions,
+# suppressions par clé). Reconstruction complète si le WAL est coupé ou si
+# les segments nécessaires ont été purgés. sync() est appelé par le
+# préchauffage après chaque écriture et avant chaque recherche.
+# -----------------------------------------------------------
+
+import re
+import sqlite3
+
+import pandas as pd
+
+from . import storage, wal
+from .trace import traced
+
+SEARCH_COLUMNS = ["kind", "key", "date", "ticker", "snippet", "score"]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY, kind TEXT, key TEXT, date TEXT, ticker TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_docs_key ON docs(kind, key);
+CREATE INDEX IF NOT EXISTS idx_docs_date ON docs(date);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(
+    body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    path = storage.journal_dir() / "search.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path, timeout=30, isolation_level=None)  # transactions explicites
+    con.execute("PRAGMA journal_mode=WAL")  # lectures pendant une mise à jour
+    con.executescript(SCHEMA)
+    return con
+
+
+def _text(s: pd.Series) -> pd.Series:
+    return s.astype(object).fillna("").astype(str).replace({"nan": "", "None": ""}).str.strip()
+
+
+def _documents(rows: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Lignes trades / daily -> documents (kind, key, date, ticker, body) non vides."""
+    if rows is None or rows.empty:
+        return pd.DataFrame(columns=["kind", "key", "date", "ticker", "body"])
+    date = pd.to_datetime(rows["date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    if table == "trades":
+        docs = pd.DataFrame({"kind": "trade", "key": rows["id"].astype(str), "date": date,
+                             "ticker": _text(rows["ticker"]), "body": _text(rows["notes"])})
+    else:
+        body = (_text(rows["day_notes"]) + "\n" + _text(rows["lesson"])).str.strip()
+        docs = pd.DataFrame({"kind": "daily", "key": date, "date": date, "ticker": "", "body": body})
+    return docs[docs["body"] != ""]
+
+
+def _delete(con: sqlite3.Connection, kind: str, keys: list):
+    params = [(kind, str(k)) for k in keys]
+    con.executemany("DELETE FROM fts WHERE rowid IN (SELECT id FROM docs WHERE kind = ? AND key = ?)", params)
+    con.executemany("DELETE FROM docs WHERE kind = ? AND key = ?", params)
+
+
+def _insert(con: sqlite3.Connection, docs: pd.DataFrame):
+    if docs.empty:
+        return
+    docs = docs.drop_duplicates(subset=["kind", "key"], keep="last")
+    _delete(con, docs["kind"].iloc[0], docs["key"].tolist())
+    first = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM docs").fetchone()[0]
+    ids = range(first, first + len(docs))
+    con.executemany("INSERT INTO docs (id, kind, key, date, ticker) VALUES (?, ?, ?, ?, ?)",
+                    zip(ids, docs["kind"], docs["key"], docs["date"], docs["ticker"]))
+    con.executemany("INSERT INTO fts (rowid, body) VALUES (?, ?)", zip(ids, docs["body"]))
+
+
+def _apply(con: sqlite3.Connection, record: dict):
+    """Applique une mutation "change" du WAL (voir storage._logged) à l'index."""
+    table = record["table"]
+    kind = "trade" if table == "trades" else "daily"
+    rows = pd.DataFrame(record["rows"])
+    _delete(con, kind, record["deleted"])
+    if not rows.empty:  # une note vidée ne doit plus être trouvée
+        keys = rows["id"] if table == "trades" else pd.to_datetime(rows["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+        _delete(con, kind, keys.dropna().astype(str).tolist())
+    _insert(con, _documents(rows, table))
+
+
+def _rebuild(con: sqlite3.Connection) -> str:
+    """Réindexe tout depuis le stockage; renvoie la version indexée."""
+    with storage._write_lock():  # trades, notes et version du même instant
+        trades = storage.load_trades(["id", "date", "ticker", "notes"])
+        daily = storage.load_daily()
+        version = _store_version()
+    con.execute("DELETE FROM fts")
+    con.execute("DELETE FROM docs")
+    _insert(con, _documents(trades, "trades"))
+    _insert(con, _documents(daily, "daily"))
+    return version
+
+
+def _store_version() -> str:
+    """Dernier seq du WAL appliqué au stockage, ou (sans WAL) signature des
+    fichiers trades + notes."""
+    if storage.WAL_ENABLED:
+        root = storage.journal_dir()
+        return f"wal:{max(wal.applied(root)['seq'], wal.checkpoint_seq(root))}"
+    daily = storage._paths()["daily"].stat()
+    return f"files:{storage._trades_signature()}:{daily.st_mtime_ns}:{daily.st_size}"
+
+
+def sync() -> int:
+    """Met l'index à jour. Renvoie le nb de mutations appliquées (-1 = reconstruit)."""
+    storage.ensure_datafiles()  # rejoue d'abord un éventuel reste du WAL
+    current = _store_version()
+    with _connect() as con:
+        row = con.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()
+        if row and row[0] == current:
+            return 0
+        con.execute("BEGIN IMMEDIATE")  # un seul thread / process met à jour
+        try:
+            row = con.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()
+            indexed = row[0] if row else ""
+            applied = 0
+            if indexed == current:
+                pass
+            elif indexed.startswith("wal:") and current.startswith("wal:"):
+                seq = int(indexed[4:])
+                top = int(current[4:])  # au-delà: mutation en cours d'application
+                records = [r for r in wal.records_after(storage.journal_dir(), seq) if r["seq"] <= top]
+                live = wal.committed(records)
+                if records and records[0]["seq"] == seq + 1 and all(r["op"] == "change" for r in live):
+                    for record in live:
+                        _apply(con, record)
+                    current, applied = f"wal:{records[-1]['seq']}", len(live)
+                else:  # segments purgés, remplacement complet (ou WAL remis à zéro): on repart du stockage
+                    current, applied = _rebuild(con), -1
+            else:
+                current, applied = _rebuild(con), -1
+            con.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('version', ?)", (current,))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    return applied
+
+
+def _fts_query(text: str) -> str:
+    """"break ret" -> "break"* "ret"* (tous les mots, en préfixe)."""
+    return " ".join(f'"{t}"*' for t in re.findall(r"\w+", text.lower()))
+
+
+@traced("filter.search")
+def search(text: str, start=None, end=None, kinds=("trade", "daily"),
+           limit: int = 50, offset: int = 0) -> pd.DataFrame:
+    """Notes contenant tous les mots de `text` (préfixes acceptés), entre
+    start et end inclus, les plus pertinentes d'abord. `key` = id du trade
+    (kind "trade") ou date de la note (kind "daily")."""
+    query = _fts_query(text)
+    if not query or not kinds:
+        return pd.DataFrame(columns=SEARCH_COLUMNS)
+    sync()
+    clauses, params = ["fts MATCH ?", f"d.kind IN ({','.join('?' * len(kinds))})"], [query, *kinds]
+    if start:
+        clauses.append("d.date >= ?"); params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end:
+        clauses.append("d.date <= ?"); params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+    sql = (f"SELECT d.kind, d.key, d.date, d.ticker, snippet(fts, 0, '**', '**', '…', 12) AS snippet, "
+           f"bm25(fts) AS score FROM fts JOIN docs d ON d.id = fts.rowid "
+           f"WHERE {' AND '.join(clauses)} ORDER BY score LIMIT {int(limit)} OFFSET {int(offset)}")
+    with _connect() as con:
+        return pd.read_sql_query(sql, con, params=params)
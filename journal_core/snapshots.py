@@ -0,0 +1,163 @@
+# snapshots.py — sauvegardes instantanées et restauration d'un journal
+# -----------------------------------------------------------
+# Fichiers dans <journal>/snapshots/ (sans Streamlit):
+# - chunks/<aa>/<sha256>.csv.gz : morceaux de trades / notes, adressés par
+#   leur contenu -> un morceau inchangé n'est jamais réécrit (dédoublonnage)
+# - <horodatage>.json           : manifeste d'un instantané (liste des morceaux)
+# Les lignes sont triées par clé (date, id) et coupées là où le hash de la
+# clé tombe sur un multiple de CHUNK_ROWS: ajouter, modifier ou supprimer une
+# ligne ne change que son morceau. Un instantané ne coûte donc (en temps et
+# en place) que ce qui a changé depuis le précédent.
+# -----------------------------------------------------------
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from . import storage
+from .schema import DAILY_COLUMNS, TRADE_COLUMNS, coerce_daily_schema, coerce_trades_schema
+
+CHUNK_ROWS = int(os.environ.get("JOURNAL_SNAPSHOT_CHUNK_ROWS", "256"))  # taille moyenne d'un morceau
+KEEP_SNAPSHOTS = int(os.environ.get("JOURNAL_SNAPSHOT_KEEP", "50"))
+TS_FORMAT = "%Y%m%d-%H%M%S-%f"
+TABLES = {"trades": (TRADE_COLUMNS, ["date", "id"]), "daily": (DAILY_COLUMNS, ["date"])}
+
+
+def _dir() -> Path:
+    return storage.journal_dir() / "snapshots"
+
+
+def _chunk_path(digest: str) -> Path:
+    return _dir() / "chunks" / digest[:2] / (digest + ".csv.gz")
+
+
+def _canonical(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Même représentation quel que soit le moteur: dates ISO, ordre des clés."""
+    columns, keys = TABLES[table]
+    df = df[columns].copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    return df.sort_values(keys, kind="stable").reset_index(drop=True)
+
+
+def _split(df: pd.DataFrame, table: str) -> list:
+    """Découpe en morceaux aux frontières définies par le contenu de la clé."""
+    if df.empty:
+        return []
+    key = TABLES[table][1][-1]
+    boundary = pd.util.hash_pandas_object(df[key], index=False).to_numpy() % CHUNK_ROWS == 0
+    group = pd.Series(boundary).shift(fill_value=False).cumsum().to_numpy()
+    row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    starts = [0] + list((group[1:] != group[:-1]).nonzero()[0] + 1) + [len(df)]
+    return [(hashlib.sha256(row_hash[a:b].tobytes()).hexdigest(), a, b)
+            for a, b in zip(starts[:-1], starts[1:])]
+
+
+def _store(df: pd.DataFrame, table: str) -> list:
+    """Écrit les morceaux absents, renvoie la liste ordonnée des hash."""
+    digests = []
+    for digest, a, b in _split(df, table):
+        path = _chunk_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(gzip.compress(df.iloc[a:b].to_csv(index=False).encode("utf-8"), compresslevel=6))
+            os.replace(tmp, path)
+        digests.append(digest)
+    return digests
+
+
+def take_snapshot(label: str = "") -> dict:
+    """Instantané des trades + notes du journal courant. Renvoie son manifeste."""
+    # sous le verrou d'écriture: trades et notes du même instant, et aucun
+    # nettoyage (prune) ne peut supprimer un morceau pas encore référencé
+    with storage._write_lock():
+        trades = _canonical(storage.load_trades(), "trades")
+        daily = _canonical(storage.load_daily(), "daily")
+        now = pd.Timestamp.now()
+        manifest = {
+            "id": now.strftime(TS_FORMAT), "created": now.isoformat(timespec="seconds"), "label": label,
+            "rows": {"trades": len(trades), "daily": len(daily)},
+            "chunks": {"trades": _store(trades, "trades"), "daily": _store(daily, "daily")},
+        }
+        path = _dir() / (manifest["id"] + ".json")
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, path)
+        prune_snapshots()
+    return manifest
+
+
+def list_snapshots() -> list:
+    """Manifestes du journal courant, du plus récent au plus ancien."""
+    if not _dir().exists():
+        return []
+    out = []
+    for path in sorted(_dir().glob("*.json"), reverse=True):
+        try:
+            out.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # manifeste illisible: ignoré
+    return out
+
+
+def find_snapshot(at=None) -> dict | None:
+    """Dernier instantané pris au plus tard à `at` (le plus récent si None)."""
+    snaps = list_snapshots()
+    if at is not None:
+        at = pd.Timestamp(at)
+        snaps = [s for s in snaps if pd.Timestamp(s["created"]) <= at]
+    return snaps[0] if snaps else None
+
+
+def _read(digests: list, table: str) -> pd.DataFrame:
+    columns = TABLES[table][0]
+    parts = [pd.read_csv(_chunk_path(d), compression="gzip", dtype={"id": str}, keep_default_na=False)
+             for d in digests]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+
+def load_snapshot(snapshot: dict) -> tuple:
+    """(trades, daily) tels qu'au moment de l'instantané."""
+    return (coerce_trades_schema(_read(snapshot["chunks"]["trades"], "trades")),
+            coerce_daily_schema(_read(snapshot["chunks"]["daily"], "daily")))
+
+
+def restore_snapshot(snapshot: dict | None = None, at=None) -> dict:
+    """Remplace trades + notes par `snapshot` (ou celui en vigueur à `at`).
+    L'état actuel est d'abord sauvegardé: une restauration s'annule."""
+    snapshot = snapshot or find_snapshot(at)
+    if snapshot is None:
+        raise LookupError("Aucune sauvegarde" + (f" avant {at}" if at is not None else ""))
+    trades, daily = load_snapshot(snapshot)
+    with storage._write_lock():
+        take_snapshot(f"before restore of {snapshot['created']}")
+        storage.save_trades(trades)
+        storage.save_daily(daily)
+    return snapshot
+
+
+def reset_journal() -> dict:
+    """Vide trades + notes après un instantané (le Reset de la sidebar)."""
+    with storage._write_lock():
+        snapshot = take_snapshot("before reset")
+        storage.save_trades(pd.DataFrame(columns=TRADE_COLUMNS))
+        storage.save_daily(pd.DataFrame(columns=DAILY_COLUMNS))
+    return snapshot
+
+
+def prune_snapshots(keep: int = KEEP_SNAPSHOTS):
+    """Ne garde que les `keep` derniers instantanés, puis supprime les
+    morceaux qu'aucun instantané restant ne référence."""
+    snaps = list_snapshots()
+    if len(snaps) <= keep:
+        return
+    for snap in snaps[keep:]:
+        (_dir() / (snap["id"] + ".json")).unlink(missing_ok=True)
+    used = {d for s in snaps[:keep] for digests in s["chunks"].values() for d in digests}
+    for path in (_dir() / "chunks").glob("*/*.csv.gz"):
+        if path.name[:-len(".csv.gz")] not in used:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,1154 @@
+# storage.py — stockage du Trading Journal (sans Streamlit)
+# -----------------------------------------------------------
+# - moteurs csv / feather / parquet / sqlite derrière load_* / save_*
+# - cache process (toutes sessions) clé = chemin + mtime + taille
+# - écritures par id (trades) / par date (notes), change-sets + conflits
+# - agrégats incrémentaux (jour, ticker) pour la page Progress
+# - plusieurs journaux (un par trader) dans un même process: dossier,
+#   caches et verrous propres à chaque journal
+# - option: trades découpés par mois (un fichier par mois + manifeste)
+# - écritures: verrou inter-process (fichier .write.lock), fichier temporaire
+#   + remplacement atomique, ajouts concurrents regroupés en un seul flush
+# - journal d'écriture anticipée (wal.py) rejoué au démarrage, checkpoints
+#   périodiques dans le stockage
+# - spans de chronométrage (trace.py): lecture / typage / écritures / requêtes
+#   (les calculs de KPIs / séries sont dans analytics.py)
+# -----------------------------------------------------------
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from .schema import (
+    DAILY_COLUMNS, DAILY_TEXT_COLUMNS, PROGRESS_COLUMNS, TRADE_CATEGORY_COLUMNS, TRADE_COLUMNS,
+    TRADE_FRAME_COLUMNS, coerce_daily_schema, coerce_trades_schema, stored_columns, unique_ids,
+)
+from . import wal
+from .trace import detached, span, traced
+
+DATA_DIR = Path("data")
+COMPACT_EVERY = 500  # nb d'ajouts append-only avant une compaction de trades.csv
+
+
+# ---------- Journaux ----------
+# Un journal = un dossier de données. "default" reste data/ (installations
+# existantes), les autres vivent dans data/journals/<nom>/. Le journal
+# courant est porté par une ContextVar: chaque session Streamlit (un thread)
+# choisit le sien à chaque rerun, un script peut utiliser use_journal().
+DEFAULT_JOURNAL = "default"
+JOURNALS_DIR = DATA_DIR / "journals"
+# Nb de journaux dont les données chargées restent en mémoire (LRU):
+# au-delà, les caches du journal resté inactif le plus longtemps sont vidés.
+MAX_LOADED_JOURNALS = int(os.environ.get("JOURNAL_MAX_LOADED", "8"))
+_CURRENT_JOURNAL = contextvars.ContextVar("journal", default=DEFAULT_JOURNAL)
+_JOURNAL_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+def current_journal() -> str:
+    return _CURRENT_JOURNAL.get()
+
+def set_journal(name: str):
+    """Journal utilisé par les load_* / save_* suivants (dans ce thread / contexte)."""
+    if not _JOURNAL_NAME.fullmatch(name or ""):
+        raise ValueError(f"Nom de journal invalide: {name!r} (lettres, chiffres, _ . -)")
+    _CURRENT_JOURNAL.set(name)
+
+@contextlib.contextmanager
+def use_journal(name: str):
+    """with use_journal("alice"): ... — pour un script ou un job."""
+    if not _JOURNAL_NAME.fullmatch(name or ""):
+        raise ValueError(f"Nom de journal invalide: {name!r} (lettres, chiffres, _ . -)")
+    token = _CURRENT_JOURNAL.set(name)
+    try:
+        yield
+    finally:
+        _CURRENT_JOURNAL.reset(token)
+
+def list_journals() -> list:
+    others = sorted(d.name for d in JOURNALS_DIR.iterdir() if d.is_dir()) if JOURNALS_DIR.exists() else []
+    return [DEFAULT_JOURNAL] + [n for n in others if n != DEFAULT_JOURNAL]
+
+def create_journal(name: str):
+    """Crée (si besoin) le dossier et les fichiers vides du journal `name`."""
+    with use_journal(name):
+        ensure_datafiles()
+
+def journal_dir(name: str | None = None) -> Path:
+    name = name or current_journal()
+    return DATA_DIR if name == DEFAULT_JOURNAL else JOURNALS_DIR / name
+
+
+# ---------- Caches par journal ----------
+# journal -> {fonction: OrderedDict(args -> valeur)}, du moins au plus récent
+_JOURNAL_CACHES = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+def _journal_cache(fn) -> OrderedDict:
+    """Entrées de `fn` pour le journal courant (appelé sous _CACHE_LOCK).
+    Marque le journal comme récemment utilisé et évince les plus anciens."""
+    name = current_journal()
+    caches = _JOURNAL_CACHES.setdefault(name, {})
+    _JOURNAL_CACHES.move_to_end(name)
+    while len(_JOURNAL_CACHES) > max(1, MAX_LOADED_JOURNALS):
+        _JOURNAL_CACHES.popitem(last=False)
+    return caches.setdefault(fn, OrderedDict())
+
+def _memo(max_entries: int):
+    """Cache LRU partagé par tout le process (donc par toutes les sessions
+    Streamlit), séparé par journal. Renvoie une copie: l'appelant peut
+    modifier le DataFrame."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            with _CACHE_LOCK:
+                entries = _journal_cache(fn)
+                if args in entries:
+                    entries.move_to_end(args)
+                    return entries[args].copy()
+            value = fn(*args)
+            with _CACHE_LOCK:
+                entries = _journal_cache(fn)
+                entries[args] = value
+                while len(entries) > max_entries:
+                    entries.popitem(last=False)
+            return value.copy()
+
+        def clear(match=None):
+            """Vide le cache de `fn` pour le journal courant (seulement les
+            entrées dont les arguments vérifient `match(args)` si fourni)."""
+            with _CACHE_LOCK:
+                caches = _JOURNAL_CACHES.get(current_journal(), {})
+                if match is None:
+                    caches.pop(fn, None)
+                    return
+                entries = caches.get(fn, {})
+                for args in [a for a in entries if match(a)]:
+                    del entries[args]
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+
+# ---------- Stockage ----------
+# Moteur choisi par variable d'environnement (JOURNAL_STORAGE):
+# - "csv"     : format historique, lisible, append-only pour les ajouts
+# - "feather" : colonnes typées, lecture par colonnes, chargement memory-mappé
+# - "parquet" : colonnes typées + compression (fichiers plus petits)
+# - "sqlite"  : data/journal.db (stdlib), index date/ticker, UPDATE/DELETE par id,
+#               filtres et KPIs calculés par le moteur SQL
+# Le CSV reste toujours disponible en import/export (sidebar).
+STORAGE_ENGINE = os.environ.get("JOURNAL_STORAGE", "csv").lower()
+STORAGE_SUFFIX = {"csv": ".csv", "feather": ".feather", "parquet": ".parquet", "sqlite": ".db"}
+if STORAGE_ENGINE not in STORAGE_SUFFIX:
+    raise ValueError(f"JOURNAL_STORAGE inconnu: {STORAGE_ENGINE!r} (csv, feather, parquet, sqlite)")
+TYPED_ENGINES = ("feather", "parquet")  # relus déjà typés (trades: colonnes compactes gardées)
+AGG_COLUMNS = ["date","ticker","count","wins","pnl"]
+# JOURNAL_PARTITION=month (csv / feather / parquet): trades rangés dans
+# trades/AAAA-MM.<ext> + trades/manifest.json (dates min/max, nb de lignes,
+# P/L par mois). Un filtre de dates ne lit que les mois concernés, une
+# écriture ne réécrit que les mois touchés, et les mois non modifiés restent
+# en cache. SQLite filtre déjà par index: l'option y est ignorée.
+PARTITION_MODE = os.environ.get("JOURNAL_PARTITION", "none").lower()
+if PARTITION_MODE not in ("none", "month"):
+    raise ValueError(f"JOURNAL_PARTITION inconnu: {PARTITION_MODE!r} (none, month)")
+PARTITIONED = PARTITION_MODE == "month" and STORAGE_ENGINE != "sqlite"
+UNDATED = "undated"  # partition des trades sans date valide
+# Journal d'écriture anticipée (JOURNAL_WAL=off pour le couper): chaque
+# mutation (ajout / modif / suppression par id ou par date, remplacement
+# complet) est d'abord écrite + fsync dans <journal>/wal/, puis appliquée au
+# stockage. Au démarrage, seul ce qui n'a pas été appliqué (reste coupé par
+# un arrêt brutal) est rejoué, en une écriture par table.
+# Checkpoint = stockage forcé sur disque + nouveau segment, tous les
+# WAL_CHECKPOINT_EVERY mutations ou WAL_SEGMENT_BYTES octets; les
+# WAL_KEEP_SEGMENTS derniers segments fermés sont gardés: l'index de recherche
+# (search.py) en rattrape le retard sans tout réindexer.
+WAL_ENABLED = os.environ.get("JOURNAL_WAL", "on").lower() not in ("0", "off", "false", "no")
+WAL_CHECKPOINT_EVERY = int(os.environ.get("JOURNAL_WAL_CHECKPOINT_EVERY", "500"))
+WAL_SEGMENT_BYTES = int(os.environ.get("JOURNAL_WAL_SEGMENT_MB", "16")) * 2**20
+WAL_KEEP_SEGMENTS = int(os.environ.get("JOURNAL_WAL_KEEP", "20"))
+
+@functools.lru_cache(maxsize=256)
+def _journal_paths(name: str) -> dict:
+    root = journal_dir(name)
+    paths = {
+        "dir": root,
+        "trades_csv": root / "trades.csv",
+        "daily_csv": root / "daily.csv",
+        "db": root / "journal.db",
+        "agg": root / "aggregates.csv",       # buckets (jour, ticker) -> count/wins/pnl
+        "agg_meta": root / "aggregates.json", # signature du fichier trades agrégé
+        "partitions": root / "trades",        # JOURNAL_PARTITION=month
+        "manifest": root / "trades" / "manifest.json",
+    }
+    if STORAGE_ENGINE == "sqlite":
+        paths["trades"] = paths["daily"] = paths["db"]
+    else:
+        paths["trades"] = paths["trades_csv"].with_suffix(STORAGE_SUFFIX[STORAGE_ENGINE])
+        paths["daily"] = paths["daily_csv"].with_suffix(STORAGE_SUFFIX[STORAGE_ENGINE])
+    return paths
+
+def _paths() -> dict:
+    """Fichiers du journal courant."""
+    return _journal_paths(current_journal())
+
+SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id TEXT PRIMARY KEY, date TEXT, time TEXT, session TEXT, ticker TEXT, side TEXT,
+    quantity REAL, entry REAL, exit REAL, strategy TEXT, notes TEXT, result_usd REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(date);
+CREATE INDEX IF NOT EXISTS idx_trades_ticker_date ON trades(ticker, date);
+CREATE TABLE IF NOT EXISTS daily (
+    date TEXT PRIMARY KEY, mood TEXT, confidence REAL, day_type TEXT, day_result TEXT,
+    day_pl REAL, sessions TEXT, day_notes TEXT, lesson TEXT, checklist_ok INTEGER,
+    screenshot_path TEXT
+);
+"""
+
+# ---------- Petites fonctions utilitaires ----------
+def ensure_datafiles():
+    """Crée le dossier du journal et les deux fichiers vides si besoin.
+    Avec un autre moteur que csv, migre une seule fois les CSV existants."""
+    p = _paths()
+    ready = p["db"] if STORAGE_ENGINE == "sqlite" else (p["manifest"] if PARTITIONED else p["trades"])
+    if not (ready.exists() and p["daily"].exists()):
+        with _write_lock():  # un seul process migre / crée les fichiers
+            _create_datafiles(p)
+    if WAL_ENABLED and not _trades_log_state()["recovered"]:
+        recover()
+
+def _create_datafiles(p: dict):
+    if STORAGE_ENGINE == "sqlite":
+        if not p["db"].exists():
+            with _db() as con:
+                con.executescript(SQL_SCHEMA)
+            trades = pd.read_csv(p["trades_csv"]) if p["trades_csv"].exists() else pd.DataFrame(columns=TRADE_COLUMNS)
+            daily = pd.read_csv(p["daily_csv"]) if p["daily_csv"].exists() else pd.DataFrame(columns=DAILY_COLUMNS)
+            _write_table(unique_ids(coerce_trades_schema(trades)), p["db"], "trades")
+            _write_table(coerce_daily_schema(daily), p["db"], "daily")
+        return
+    if PARTITIONED:
+        if not p["manifest"].exists():
+            # migration unique: l'ancien fichier unique est découpé par mois
+            # (il reste en place mais n'est plus lu)
+            src = p["trades"] if p["trades"].exists() else p["trades_csv"]
+            df = _read_table(src) if src.exists() else pd.DataFrame(columns=TRADE_COLUMNS)
+            p["partitions"].mkdir(parents=True, exist_ok=True)
+            _write_partitions(unique_ids(coerce_trades_schema(df)))
+    elif not p["trades"].exists():
+        df = pd.read_csv(p["trades_csv"]) if p["trades_csv"].exists() else pd.DataFrame(columns=TRADE_COLUMNS)
+        _write_table(coerce_trades_schema(df), p["trades"])
+    if not p["daily"].exists():
+        df = pd.read_csv(p["daily_csv"]) if p["daily_csv"].exists() else pd.DataFrame(columns=DAILY_COLUMNS)
+        _write_table(coerce_daily_schema(df), p["daily"])
+
+def _db() -> sqlite3.Connection:
+    """Connexion courte à la base du journal courant (à utiliser avec `with`)."""
+    return sqlite3.connect(_paths()["db"])
+
+def _sql_records(df: pd.DataFrame, columns: list) -> list:
+    """Lignes prêtes pour executemany: dates en ISO, NaN -> NULL."""
+    out = df[columns].copy()
+    if "date" in out:
+        out["date"] = pd.to_datetime(out["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    if "checklist_ok" in out:
+        out["checklist_ok"] = out["checklist_ok"].astype(bool).astype(int)
+    out = out.astype(object).where(out.notna(), None)
+    return list(out.itertuples(index=False, name=None))
+
+def _sql_upsert(con: sqlite3.Connection, table: str, df: pd.DataFrame, columns: list):
+    """Insère ou met à jour sur place par clé (id / date): une ligne éditée
+    garde son rowid, donc sa place dans l'ordre de lecture (comme en csv).
+    INSERT OR REPLACE la supprimerait puis la réinsérerait en fin de table."""
+    key = "id" if table == "trades" else "date"
+    placeholders = ",".join("?" * len(columns))
+    updates = ",".join(f"{c} = excluded.{c}" for c in columns if c != key)
+    con.executemany(f"INSERT INTO {table} ({','.join(columns)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT({key}) DO UPDATE SET {updates}",
+                    _sql_records(df, columns))
+
+def _sql_rows_by_id(con: sqlite3.Connection, ids: list, columns: list = PROGRESS_COLUMNS) -> pd.DataFrame:
+    """Version actuelle (par défaut date, ticker, result_usd) des trades `ids`."""
+    parts = [pd.read_sql_query(f"SELECT {','.join(columns)} FROM trades WHERE id IN ({','.join('?' * len(chunk))})",
+                               con, params=chunk)
+             for chunk in (ids[i:i + 500] for i in range(0, len(ids), 500))]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+def _read_table(path: Path, columns: list | None = None, table: str = "trades") -> pd.DataFrame:
+    """Lit un fichier du moteur courant (seulement `columns` si précisé)."""
+    if path.suffix == ".db":
+        with _db() as con:
+            return pd.read_sql_query(f"SELECT {','.join(columns or ['*'])} FROM {table} ORDER BY rowid", con)
+    if path.suffix == ".feather":
+        import pyarrow.feather as feather  # installé avec streamlit
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    return pd.read_csv(path, usecols=columns)
+
+def _write_table(df: pd.DataFrame, path: Path, table: str = "trades"):
+    if path.suffix == ".db":
+        with _db() as con:  # une seule transaction
+            con.execute(f"DELETE FROM {table}")
+            _sql_upsert(con, table, df, TRADE_COLUMNS if table == "trades" else DAILY_COLUMNS)
+        return
+    if "timestamp" in df:
+        df = df.drop(columns="timestamp")  # recalculé au chargement
+    # Écrit à côté puis remplace: un DataFrame en cache peut encore pointer
+    # (memory_map) sur l'ancien fichier, qu'il ne faut jamais tronquer.
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".feather":
+        # non compressé: condition pour que memory_map évite toute copie
+        df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+    elif path.suffix == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def _atomic_write_text(path: Path, text: str):
+    """Petits fichiers (manifeste, signature): temporaire + remplacement."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+# Cache partagé entre reruns ET sessions: clé = (chemin, mtime, taille).
+# Un fichier inchangé n'est donc ni relu ni re-typé; les écritures vident
+# en plus le cache explicitement (mtime peut être identique à la seconde près).
+def _read_trades_file(path: str, columns: tuple | None = None) -> pd.DataFrame:
+    cols = list(columns) if columns else None
+    with span("load.trades"):
+        df = _read_table(Path(path), stored_columns(cols))
+    if df.empty:
+        return pd.DataFrame(columns=cols or TRADE_FRAME_COLUMNS)
+    # feather / parquet: colonnes déjà compactes, coerce ne les touche pas
+    # (seuls les anciens fichiers, écrits avant le typage compact, sont convertis)
+    with span("coerce.trades"):
+        df = coerce_trades_schema(df, cols)
+    # ids dupliqués d'anciens CSV: renommés ici pour que les écritures par id
+    # (éditeur, change-sets) visent une seule ligne
+    return unique_ids(df) if "id" in df else df
+
+@_memo(max_entries=8)
+def _read_trades_cached(path: str, mtime_ns: int, size: int, columns: tuple | None = None) -> pd.DataFrame:
+    return _read_trades_file(path, columns)
+
+def load_trades(columns: list | None = None) -> pd.DataFrame:
+    """Charge les trades; `columns` = projection (ex. ["date","ticker","result_usd"])."""
+    ensure_datafiles()
+    return _load_trades(columns)
+
+def peek_trades(columns: list | None = None) -> pd.DataFrame:
+    """Comme load_trades, en lecture seule: ni création de fichiers, ni
+    migration, ni rejeu du WAL (import --dry-run). Sans fichier de trades
+    dans le moteur courant: frame vide."""
+    p = _paths()
+    if not (p["db"] if STORAGE_ENGINE == "sqlite" else (p["manifest"] if PARTITIONED else p["trades"])).exists():
+        return pd.DataFrame(columns=columns or TRADE_FRAME_COLUMNS)
+    return _load_trades(columns)
+
+def _load_trades(columns: list | None = None) -> pd.DataFrame:
+    if PARTITIONED:
+        return _load_partitions(sorted(_read_manifest()), columns)
+    stat = _paths()["trades"].stat()
+    return _read_trades_cached(str(_paths()["trades"]), stat.st_mtime_ns, stat.st_size,
+                               tuple(columns) if columns else None)
+
+def load_trades_between(start=None, end=None, columns: list | None = None) -> pd.DataFrame:
+    """Comme load_trades, mais avec JOURNAL_PARTITION=month ne lit que les mois
+    qui recoupent [start, end] d'après le manifeste (filtrage à faire ensuite)."""
+    if not PARTITIONED or (start is None and end is None):
+        return load_trades(columns)
+    ensure_datafiles()
+    start = pd.Timestamp(start or pd.Timestamp.min).strftime("%Y-%m-%d")
+    end = pd.Timestamp(end or pd.Timestamp.max).strftime("%Y-%m-%d")
+    months = [m for m, e in _read_manifest().items()
+              if m != UNDATED and e["min"] <= end and e["max"] >= start]
+    return _load_partitions(sorted(months), columns)
+
+@traced("save.trades")
+def save_trades(df: pd.DataFrame):
+    """Remplace tous les trades (import CSV, Reset). Ids en double renommés
+    (id-2, id-3…) quel que soit le moteur: SQLite les fusionnerait."""
+    df = unique_ids(coerce_trades_schema(df.copy()))
+    with _logged("replace", "trades", df):
+        _save_trades(df)
+
+def _save_trades(df: pd.DataFrame):
+    """Réécriture complète, sans journal (compaction, rejeu, fusions)."""
+    with _write_lock():
+        df = unique_ids(coerce_trades_schema(df))
+        if PARTITIONED:
+            _write_partitions(df)
+        else:
+            _write_table(df, _paths()["trades"])
+        rebuild_aggregates(df)  # réécriture complète -> agrégats recalculés en mémoire
+        clear_data_cache()
+
+
+# ---------- Partitions mensuelles (JOURNAL_PARTITION=month) ----------
+# Un mois non modifié garde le même fichier (mtime, taille): il reste en
+# cache d'une écriture à l'autre. Seuls les mois réécrits sont évincés.
+@_memo(max_entries=512)
+def _read_partition_cached(path: str, mtime_ns: int, size: int, columns: tuple | None = None) -> pd.DataFrame:
+    return _read_trades_file(path, columns)
+
+def _month_keys(dates) -> pd.Series:
+    return pd.to_datetime(pd.Series(dates), errors="coerce").dt.strftime("%Y-%m").fillna(UNDATED)
+
+def _partition_path(month: str) -> Path:
+    return _paths()["partitions"] / (month + STORAGE_SUFFIX[STORAGE_ENGINE])
+
+def _read_manifest() -> dict:
+    """{mois: {"rows", "pnl", "min", "max"}} — un seul petit fichier JSON."""
+    try:
+        return json.loads(_paths()["manifest"].read_text())["partitions"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def _write_manifest(parts: dict):
+    _atomic_write_text(_paths()["manifest"], json.dumps({"partitions": dict(sorted(parts.items()))}, indent=1))
+
+def _manifest_entry(part: pd.DataFrame) -> dict:
+    dates = pd.to_datetime(part["date"], errors="coerce").dropna()
+    return {"rows": int(len(part)),
+            "pnl": float(pd.to_numeric(part["result_usd"], errors="coerce").fillna(0.0).sum()),
+            "min": dates.min().strftime("%Y-%m-%d") if not dates.empty else "",
+            "max": dates.max().strftime("%Y-%m-%d") if not dates.empty else ""}
+
+def _load_partitions(months: list, columns: list | None = None) -> pd.DataFrame:
+    frames = []
+    for month in months:
+        path = _partition_path(month)
+        if path.exists():
+            stat = path.stat()
+            frames.append(_read_partition_cached(str(path), stat.st_mtime_ns, stat.st_size,
+                                                 tuple(columns) if columns else None))
+    if not frames:
+        return pd.DataFrame(columns=columns or TRADE_FRAME_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    for c in TRADE_CATEGORY_COLUMNS:  # catégories différentes d'un mois à l'autre -> objet
+        if c in df and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    return unique_ids(df) if "id" in df else df
+
+def _write_partitions(df: pd.DataFrame, months=None):
+    """Réécrit les mois `months` (tous si None) à partir de `df`, qui doit
+    contenir toutes les lignes de ces mois; un mois vide est supprimé."""
+    manifest = _read_manifest()
+    keys = _month_keys(df["date"]).to_numpy()
+    targets = set(keys) | set(manifest) if months is None else set(months)
+    _paths()["partitions"].mkdir(parents=True, exist_ok=True)
+    for month in sorted(targets):
+        part = df[keys == month]
+        path = _partition_path(month)
+        if part.empty:
+            path.unlink(missing_ok=True)
+            manifest.pop(month, None)
+        else:
+            _write_table(part, path)
+            manifest[month] = _manifest_entry(part)
+    _write_manifest(manifest)
+    written = {str(_partition_path(m)) for m in targets}
+    _read_partition_cached.clear(lambda args: args[0] in written)
+
+def _append_partitions(new: pd.DataFrame) -> set:
+    """Ajoute `new` aux seuls mois concernés (ajout en fin de fichier en csv).
+    Renvoie les mois touchés."""
+    manifest = _read_manifest()
+    keys = _month_keys(new["date"]).to_numpy()
+    _paths()["partitions"].mkdir(parents=True, exist_ok=True)
+    for month in sorted(set(keys)):
+        part = new[keys == month]
+        path = _partition_path(month)
+        if STORAGE_ENGINE == "csv" and path.exists() and _csv_header(path) == TRADE_COLUMNS:
+            _append_csv(path, part)
+        else:
+            old = _load_partitions([month]) if path.exists() else None
+            _write_table(pd.concat([old, part], ignore_index=True) if old is not None else part, path)
+        entry = _manifest_entry(part)
+        if month in manifest:
+            prev = manifest[month]
+            entry["rows"] += prev["rows"]; entry["pnl"] += prev["pnl"]
+            entry["min"] = min(filter(None, [prev["min"], entry["min"]]), default="")
+            entry["max"] = max(filter(None, [prev["max"], entry["max"]]), default="")
+        manifest[month] = entry
+    _write_manifest(manifest)
+    written = {str(_partition_path(m)) for m in set(keys)}
+    _read_partition_cached.clear(lambda args: args[0] in written)
+    return set(keys)
+
+def clear_data_cache():
+    """Invalide les DataFrames en cache (après une écriture ou un Reset),
+    puis prévient les abonnés (ex. préchauffage de la page Progress)."""
+    _read_trades_cached.clear()
+    _read_daily_cached.clear()
+    _sql_query_cached.clear()
+    _read_aggregates_cached.clear()
+    for listener in list(_WRITE_LISTENERS):
+        listener()
+
+_WRITE_LISTENERS = []
+
+def add_write_listener(fn):
+    """Appelle `fn()` (sans argument, doit rendre la main vite) après chaque écriture."""
+    if fn not in _WRITE_LISTENERS:
+        _WRITE_LISTENERS.append(fn)
+
+# ---------- Coordination des écritures ----------
+# Deux niveaux de verrou, toujours pris dans cet ordre:
+# - un RLock par journal (threads / sessions Streamlit du process)
+# - un verrou de fichier <journal>/.write.lock (autres process: 2e serveur,
+#   import_trades.py), pris une seule fois même en cas de ré-entrée
+# Toute séquence lire-fusionner-écrire se fait sous _write_lock(): deux
+# onglets qui enregistrent en même temps ne peuvent plus perdre de lignes.
+_LOG_STATES = {}
+_LOG_STATES_LOCK = threading.Lock()
+
+def _trades_log_state() -> dict:
+    """État partagé (toutes sessions du process) des écritures du journal
+    courant. Jamais évincé: le verrou doit survivre aux caches."""
+    with _LOG_STATES_LOCK:
+        return _LOG_STATES.setdefault(current_journal(), {
+            "lock": threading.RLock(), "depth": 0, "lockfile": None,
+            "pending": 0, "compacting": False, "recovered": False,
+            "queue": [], "queue_lock": threading.Lock(),
+        })
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(f):
+        while True:
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # LK_LOCK abandonne après ~10 s: on réessaie
+                time.sleep(0.05)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextlib.contextmanager
+def _write_lock():
+    """Exclusion mutuelle des écritures du journal courant (threads + process)."""
+    state = _trades_log_state()
+    with state["lock"]:
+        if state["depth"] == 0:
+            _paths()["dir"].mkdir(parents=True, exist_ok=True)
+            f = open(_paths()["dir"] / ".write.lock", "a+b")
+            try:
+                _lock_file(f)
+            except BaseException:
+                f.close()
+                raise
+            state["lockfile"] = f
+        state["depth"] += 1
+        try:
+            yield state
+        finally:
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                f, state["lockfile"] = state["lockfile"], None
+                _unlock_file(f)
+                f.close()
+
+def append_trade(row: dict):
+    """Ajoute UNE ligne à trades.csv (coût I/O constant) puis fsync."""
+    append_trades(pd.DataFrame([row]))
+
+@traced("save.append")
+def append_trades(rows: pd.DataFrame, compact: bool = True):
+    """Ajoute un lot de trades en une seule écriture (+ fsync).
+    Group commit: les ajouts qui arrivent pendant qu'un autre thread écrit
+    attendent dans une file; le prochain à obtenir le verrou écrit toute la
+    file en UN ajout + fsync + delta d'agrégats, puis réveille les autres.
+    `compact=False`: pas de compaction en arrière-plan (scripts courts)."""
+    if rows.empty:
+        return
+    ensure_datafiles()
+    state = _trades_log_state()
+    item = {"rows": coerce_trades_schema(rows.copy()), "done": threading.Event(), "error": None}
+    with state["queue_lock"]:
+        state["queue"].append(item)
+    with _write_lock():
+        if not item["done"].is_set():  # sinon déjà écrit par le lot d'un autre thread
+            with state["queue_lock"]:
+                batch, state["queue"] = state["queue"], []
+            try:
+                new = pd.concat([b["rows"] for b in batch], ignore_index=True)
+                with _logged("change", "trades", new):
+                    _append_batch(new, compact)
+            except Exception as e:
+                for b in batch:
+                    b["error"] = e
+            finally:
+                for b in batch:
+                    b["done"].set()
+    if item["error"] is not None:
+        raise item["error"]
+
+def _append_batch(new: pd.DataFrame, compact: bool):
+    """Écrit un lot déjà typé (appelé sous _write_lock)."""
+    state = _trades_log_state()
+    fresh = aggregates_fresh()
+    if STORAGE_ENGINE == "sqlite":
+        with _db() as con:
+            _sql_upsert(con, "trades", new, TRADE_COLUMNS)
+        update_aggregates(fresh, added=new)
+        clear_data_cache()
+        return
+    if PARTITIONED:
+        state.setdefault("dirty", set()).update(_append_partitions(new))
+    elif STORAGE_ENGINE == "csv" and _csv_header(_paths()["trades"]) == TRADE_COLUMNS:
+        _append_csv(_paths()["trades"], new)
+    else:
+        _save_trades(pd.concat([load_trades(), new], ignore_index=True))
+        return
+    update_aggregates(fresh, added=new)
+    clear_data_cache()
+    state["pending"] += len(new)
+    if compact and state["pending"] >= COMPACT_EVERY and not state["compacting"]:
+        state["compacting"] = True
+        # copy_context: le thread compacte le même journal que l'appelant
+        threading.Thread(target=contextvars.copy_context().run, args=(_compact_in_background,), daemon=True).start()
+
+def _compact_in_background():
+    with detached():  # jamais dans les spans du rerun qui a déclenché l'ajout
+        compact_trades()
+
+def _csv_header(path: Path) -> list:
+    with open(path, "rb") as f:
+        return f.readline().decode("utf-8-sig").strip().split(",")
+
+def _append_csv(path: Path, rows: pd.DataFrame):
+    """Ajout en fin de fichier (coût proportionnel au lot) + fsync
+    (sauf avec le WAL, déjà synchronisé: le fichier l'est au checkpoint)."""
+    lines = rows[TRADE_COLUMNS].to_csv(header=False, index=False)
+    with open(path, "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(lines.encode("utf-8"))
+        f.flush()
+        if not WAL_ENABLED:
+            os.fsync(f.fileno())
+
+def compact_trades():
+    """Réécrit trades.csv au propre (types, ids uniques) en arrière-plan.
+    Partitionné: seulement les mois qui ont reçu des ajouts depuis.
+    Le verrou empêche un ajout ou une édition de se glisser pendant la réécriture."""
+    state = _trades_log_state()
+    try:
+        with _write_lock():
+            if PARTITIONED:
+                months = sorted(state.pop("dirty", set()))
+                _write_partitions(_load_partitions(months), months)
+                clear_data_cache()
+            else:
+                _save_trades(unique_ids(load_trades()))
+            state["pending"] = 0
+            if WAL_ENABLED:
+                _mark_applied()  # réécriture hors WAL: même contenu, nouvelle signature
+    finally:
+        state["compacting"] = False
+
+@_memo(max_entries=8)
+def _read_daily_cached(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    with span("load.daily"):
+        df = _read_table(Path(path), table="daily")
+    if STORAGE_ENGINE in TYPED_ENGINES and not df.empty:
+        return df
+    with span("coerce.daily"):
+        return coerce_daily_schema(df)
+
+def load_daily() -> pd.DataFrame:
+    ensure_datafiles()
+    stat = _paths()["daily"].stat()
+    return _read_daily_cached(str(_paths()["daily"]), stat.st_mtime_ns, stat.st_size)
+
+@traced("save.daily")
+def save_daily(df: pd.DataFrame):
+    df = df.copy()
+    for col in DAILY_COLUMNS:
+        if col not in df.columns:
+            df[col] = "" if col in DAILY_TEXT_COLUMNS else 0
+    with _logged("replace", "daily", df[DAILY_COLUMNS]):
+        _save_daily(df)
+
+def _save_daily(df: pd.DataFrame):
+    with _write_lock():
+        if STORAGE_ENGINE == "csv":
+            _write_table(df[DAILY_COLUMNS], _paths()["daily"], "daily")
+        else:
+            fresh = aggregates_fresh()
+            _write_table(coerce_daily_schema(df[DAILY_COLUMNS]), _paths()["daily"], "daily")
+            if STORAGE_ENGINE == "sqlite":  # sqlite: même fichier, trades inchangés
+                update_aggregates(fresh)
+        clear_data_cache()
+
+def export_csv(df: pd.DataFrame) -> bytes:
+    """Export CSV portable (quel que soit le moteur de stockage)."""
+    return df.drop(columns="timestamp", errors="ignore").to_csv(index=False).encode("utf-8")
+
+
+# ---------- Écritures ligne à ligne (par id / par date) ----------
+@traced("save.trade_changes")
+def apply_trade_changes(upserts: pd.DataFrame | None = None, delete_ids: list = ()):
+    """Applique des modifications identifiées par id: `upserts` (lignes
+    modifiées ou nouvelles) et `delete_ids` (lignes supprimées).
+    SQLite: UPDATE/INSERT/DELETE des seules lignes concernées; sinon UNE
+    fusion + réécriture du fichier."""
+    upserts = coerce_trades_schema(upserts.copy()) if upserts is not None and not upserts.empty else None
+    delete_ids = [str(i) for i in delete_ids]
+    if upserts is None and not delete_ids:
+        return
+    with _logged("change", "trades", upserts, delete_ids):
+        _apply_trade_changes(upserts, delete_ids)
+
+def _apply_trade_changes(upserts: pd.DataFrame | None, delete_ids: list):
+    """apply_trade_changes sans journal (entrées déjà typées)."""
+    with _write_lock():
+        if STORAGE_ENGINE == "sqlite":
+            fresh = aggregates_fresh()
+            touched = delete_ids + (upserts["id"].tolist() if upserts is not None else [])
+            with _db() as con:
+                old = _sql_rows_by_id(con, touched)
+                con.executemany("DELETE FROM trades WHERE id = ?", [(i,) for i in delete_ids])
+                if upserts is not None:
+                    _sql_upsert(con, "trades", upserts, TRADE_COLUMNS)
+            update_aggregates(fresh, added=upserts, removed=old)
+            clear_data_cache()
+            return
+        fresh = aggregates_fresh()
+        df = load_trades()
+        touched = delete_ids + (upserts["id"].tolist() if upserts is not None else [])
+        old = df[df["id"].isin(touched)]
+        df = df[~df["id"].isin(delete_ids)]
+        rows = None
+        if upserts is not None:
+            rows = upserts.drop_duplicates(subset="id", keep="last").set_index("id", drop=False)
+            hit = df["id"].isin(rows.index)
+            # nouvelles versions remises à la place des anciennes (concat, pas
+            # d'affectation: les catégories n'acceptent pas toute valeur)
+            replaced = rows.loc[df.loc[hit, "id"], TRADE_COLUMNS].set_axis(df.index[hit])
+            df = pd.concat([df[~hit], replaced]).sort_index(kind="stable")
+            df = pd.concat([df, rows[~rows.index.isin(df["id"])]], ignore_index=True)
+        if not PARTITIONED:
+            _save_trades(df)
+            return
+        # seuls les mois de l'ancienne et de la nouvelle version sont réécrits
+        months = set(_month_keys(old["date"]))
+        if rows is not None:
+            months |= set(_month_keys(rows["date"]))
+        _write_partitions(df, months)
+        update_aggregates(fresh, added=rows, removed=old)
+        clear_data_cache()
+
+@traced("save.daily_changes")
+def apply_daily_changes(upserts: pd.DataFrame | None = None, delete_dates: list = ()):
+    """Même chose pour les notes du jour, identifiées par leur date."""
+    upserts = coerce_daily_schema(upserts.copy()) if upserts is not None and not upserts.empty else None
+    delete_dates = list(pd.to_datetime(pd.Series(list(delete_dates), dtype=object)).dt.date)
+    if upserts is None and not delete_dates:
+        return
+    with _logged("change", "daily", upserts, delete_dates):
+        _apply_daily_changes(upserts, delete_dates)
+
+def _apply_daily_changes(upserts: pd.DataFrame | None, delete_dates: list):
+    with _write_lock():
+        if STORAGE_ENGINE == "sqlite":
+            fresh = aggregates_fresh()
+            with _db() as con:
+                con.executemany("DELETE FROM daily WHERE date = ?",
+                                [(pd.Timestamp(d).strftime("%Y-%m-%d"),) for d in delete_dates])
+                if upserts is not None:
+                    _sql_upsert(con, "daily", upserts, DAILY_COLUMNS)
+            update_aggregates(fresh)
+            clear_data_cache()
+            return
+        ddf = load_daily()
+        ddf = ddf[~ddf["date"].isin(delete_dates)]
+        if upserts is not None:
+            ddf = pd.concat([ddf[~ddf["date"].isin(upserts["date"])], upserts], ignore_index=True)
+        _save_daily(ddf)
+
+def upsert_daily(rows: pd.DataFrame):
+    """Une note par jour: la dernière version de chaque date gagne."""
+    apply_daily_changes(upserts=rows)
+
+
+# ---------- Journal d'écriture anticipée (JOURNAL_WAL) ----------
+def _wal_rows(df: pd.DataFrame | None) -> list:
+    if df is None or df.empty:
+        return []
+    out = df.drop(columns="timestamp", errors="ignore")
+    if "date" in out:
+        out["date"] = pd.to_datetime(out["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    return out.astype(object).where(out.notna(), None).to_dict("records")
+
+@contextlib.contextmanager
+def _logged(op: str, table: str, rows: pd.DataFrame | None = None, deleted: list = ()):
+    """Écrit la mutation dans le WAL (fsync) puis laisse le bloc l'appliquer
+    au stockage, le tout sous le verrou d'écriture.
+    op "change": upsert de `rows` + suppression des clés `deleted` (id / date);
+    op "replace": `rows` devient tout le contenu de `table`. Entre deux
+    checkpoints, et sans les lignes quand l'écriture est atomique (un fichier
+    remplacé d'un coup, une transaction SQLite): seul le partitionné les garde.
+    Application en échec -> enregistrement "abort": ni rejouée, ni indexée."""
+    ensure_datafiles()  # rejoue d'abord un éventuel reste du WAL
+    with _write_lock():
+        if not WAL_ENABLED:
+            yield
+            return
+        root = _paths()["dir"]
+        if op == "replace":
+            checkpoint()  # rien d'antérieur à rejouer par-dessus le nouveau contenu
+        seq = wal.append(root, {
+            "ts": pd.Timestamp.now().isoformat(timespec="seconds"), "op": op, "table": table,
+            "rows": _wal_rows(rows) if op == "change" or (PARTITIONED and table == "trades") else None,
+            "deleted": [d.isoformat() if hasattr(d, "isoformat") else str(d) for d in deleted],
+        })
+        try:
+            yield
+        except BaseException:
+            wal.append(root, {"ts": pd.Timestamp.now().isoformat(timespec="seconds"), "op": "abort",
+                              "table": table, "of": seq})
+            _mark_applied()
+            raise
+        count, size = wal.pending(root)
+        if op == "replace" or count >= WAL_CHECKPOINT_EVERY or size >= WAL_SEGMENT_BYTES:
+            checkpoint()
+        else:
+            _mark_applied()
+
+def _store_signature() -> list:
+    out = []
+    for f in _store_files():
+        if f.is_file():
+            st = f.stat()
+            out.append([f.name, st.st_mtime_ns, st.st_size])
+    return out
+
+def _mark_applied():
+    """Tout le WAL écrit est appliqué au stockage dans son état actuel
+    (écriture atomique sans fsync: le rejeu ne couvre plus qu'un reste coupé)."""
+    root = _paths()["dir"]
+    wal.mark_applied(root, wal.last_seq(root), _store_signature())
+
+def _replay(records: list):
+    """Rejoue des mutations: une fusion en mémoire puis UNE écriture par
+    table (upserts / suppressions par clé, la dernière gagne)."""
+    for table, key in (("trades", "id"), ("daily", "date")):
+        base, upserts, deleted = None, {}, set()
+        for record in records:
+            if record["table"] != table:
+                continue
+            if record["op"] == "replace":  # sans lignes: déjà en place (écriture atomique)
+                base, upserts, deleted = record["rows"], {}, set()
+                continue
+            for k in record["deleted"]:
+                upserts.pop(str(k), None)
+                deleted.add(str(k))
+            for row in record["rows"]:
+                upserts[str(row[key])] = row
+                deleted.discard(str(row[key]))
+        if base is None and not upserts and not deleted:
+            continue
+        columns = TRADE_COLUMNS if table == "trades" else DAILY_COLUMNS
+        coerce = coerce_trades_schema if table == "trades" else coerce_daily_schema
+        rows = coerce(pd.DataFrame(list(upserts.values()), columns=columns))
+        if base is not None:
+            df = coerce(pd.DataFrame(base, columns=columns))
+            keys = df[key].astype(str) if table == "trades" else pd.to_datetime(df[key]).dt.strftime("%Y-%m-%d")
+            df = pd.concat([df[~keys.isin(deleted | set(upserts))], rows], ignore_index=True)
+            (_save_trades if table == "trades" else _save_daily)(df)
+        elif table == "trades":
+            _apply_trade_changes(rows if not rows.empty else None, sorted(deleted))
+        else:
+            _apply_daily_changes(rows if not rows.empty else None,
+                                 list(pd.to_datetime(pd.Series(sorted(deleted), dtype=object)).dt.date))
+
+def recover() -> int:
+    """Rejoue les mutations pas encore appliquées au stockage (arrêt brutal
+    entre le WAL et le stockage) puis fait un checkpoint. Une fois par journal
+    et par process (appelé par ensure_datafiles). Renvoie le nb rejoué.
+    Point de départ: la dernière mutation appliquée si les fichiers n'ont pas
+    bougé depuis, sinon (coupure de courant, fichier remplacé) le checkpoint.
+    Rejeu idempotent: upserts / suppressions par clé."""
+    state = _trades_log_state()
+    with _write_lock():
+        if state["recovered"]:
+            return 0
+        state["recovered"] = True  # les load_* du rejeu ne doivent pas relancer recover
+        try:
+            root = _paths()["dir"]
+            start, applied = wal.checkpoint_seq(root), wal.applied(root)
+            if applied["seq"] > start and applied["store"] == _store_signature():
+                start = applied["seq"]
+            records = wal.committed(wal.records_after(root, start))
+            if records:
+                _replay(records)
+            if start < wal.last_seq(root):
+                checkpoint()
+            return len(records)
+        except BaseException:
+            state["recovered"] = False
+            raise
+
+def _store_files() -> list:
+    p = _paths()
+    if STORAGE_ENGINE == "sqlite":
+        return [p["db"]]
+    if PARTITIONED:
+        trades = [_partition_path(m) for m in _read_manifest()] + [p["manifest"], p["partitions"]]
+    else:
+        trades = [p["trades"]]
+    return trades + [p["daily"], p["dir"]]
+
+def checkpoint():
+    """Force le stockage sur disque et marque tout le WAL écrit comme appliqué.
+    Le segment courant est fermé: le suivant démarre à la prochaine mutation."""
+    if not WAL_ENABLED:
+        return
+    with _write_lock():
+        root = _paths()["dir"]
+        for path in _store_files():
+            wal.fsync_path(path)  # sqlite: déjà synchronisé à chaque transaction
+        wal.mark_checkpoint(root, wal.last_seq(root), WAL_KEEP_SEGMENTS)
+        _mark_applied()
+
+
+# ---------- Change-sets (éditeurs "Manage ...") ----------
+# L'éditeur renvoie la page éditée avec le même index que l'instantané affiché.
+# On en déduit les lignes insérées / modifiées / supprimées (clé: id ou date),
+# on vérifie qu'elles n'ont pas changé en base depuis l'instantané, puis on
+# n'écrit que ces lignes.
+class ConflictError(Exception):
+    """Des lignes éditées ont été modifiées ailleurs depuis leur chargement."""
+
+def _rows_differ(a: pd.DataFrame, b: pd.DataFrame) -> pd.Series:
+    """Masque (index commun) des lignes dont au moins une cellule diffère."""
+    cols = [c for c in a.columns if c in b.columns]
+    a = a[cols].astype(object); b = b.loc[a.index, cols].astype(object)
+    same = (a == b) | (a.isna() & b.isna())
+    return ~same.all(axis=1)
+
+def compute_changeset(before: pd.DataFrame, after: pd.DataFrame, key: str) -> dict:
+    """{"inserted": df, "updated": df, "deleted": [clés]} entre l'instantané
+    `before` et la version éditée `after` (colonne "delete" optionnelle).
+    Une clé modifiée (ex. date d'une note) = suppression + insertion."""
+    flagged = after["delete"].fillna(False).astype(bool) if "delete" in after else pd.Series(False, index=after.index)
+    after = after.drop(columns=["delete"], errors="ignore")
+    before = before.drop(columns=["delete"], errors="ignore")
+    kept = after[~flagged]
+    common = kept.index.intersection(before.index)
+    rekeyed = common[(kept.loc[common, key] != before.loc[common, key]).to_numpy()]
+    same_key = common.difference(rekeyed)
+    updated = kept.loc[same_key][_rows_differ(kept.loc[same_key], before).to_numpy()] if len(same_key) else kept.iloc[0:0]
+    inserted = kept.loc[kept.index.difference(before.index).union(rekeyed)]
+    gone = after.index[flagged.to_numpy()].intersection(before.index).union(rekeyed)
+    return {"inserted": inserted, "updated": updated, "deleted": before.loc[gone, key].tolist()}
+
+def _check_conflicts(current: pd.DataFrame, snapshot: pd.DataFrame, changes: dict, key: str):
+    """Lève ConflictError si une ligne touchée a bougé depuis l'instantané."""
+    cur = current.drop_duplicates(subset=key, keep="last").set_index(key)
+    snap = snapshot.drop(columns=["delete"], errors="ignore").drop_duplicates(subset=key, keep="last").set_index(key)
+    touched = list(changes["updated"][key]) + list(changes["deleted"])
+    missing = [k for k in touched if k not in cur.index]
+    taken = [k for k in changes["inserted"][key] if k in cur.index and k not in changes["deleted"]]
+    present = [k for k in touched if k in cur.index and k in snap.index]
+    moved = list(snap.loc[present].index[_rows_differ(snap.loc[present], cur).to_numpy()]) if present else []
+    if missing or taken or moved:
+        raise ConflictError(f"{len(missing) + len(taken) + len(moved)} row(s) changed since they were loaded "
+                            f"(first: {(missing + taken + moved)[0]}). Reload and re-apply your edits.")
+
+def apply_trade_changeset(changes: dict, snapshot: pd.DataFrame):
+    touched = list(changes["updated"]["id"]) + list(changes["deleted"]) + list(changes["inserted"]["id"])
+    with _write_lock():
+        if STORAGE_ENGINE == "sqlite":
+            with _db() as con:
+                current = _sql_rows_by_id(con, [str(i) for i in touched], TRADE_COLUMNS)
+            current = coerce_trades_schema(current)
+        else:
+            current = load_trades()
+            current = current[current["id"].isin(touched)]
+        _check_conflicts(current, snapshot, changes, "id")
+        apply_trade_changes(pd.concat([changes["inserted"], changes["updated"]]), changes["deleted"])
+
+def apply_daily_changeset(changes: dict, snapshot: pd.DataFrame):
+    with _write_lock():
+        _check_conflicts(load_daily(), snapshot, changes, "date")
+        apply_daily_changes(pd.concat([changes["inserted"], changes["updated"]]), changes["deleted"])
+
+
+# ---------- Agrégats incrémentaux (page Progress) ----------
+# Un bucket par (jour, ticker): nb de trades, gagnants, somme des result_usd.
+# Chaque écriture applique un delta (+ lignes ajoutées, - anciennes versions),
+# donc la page Progress ne relit jamais tout l'historique: KPIs, equity,
+# weekly/monthly et filtres date/paires se calculent en combinant les buckets.
+def _trade_buckets(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=AGG_COLUMNS)
+    pl = pd.to_numeric(df["result_usd"], errors="coerce").fillna(0.0)
+    b = pd.DataFrame({
+        "date": pd.to_datetime(df["date"], errors="coerce"),
+        "ticker": df["ticker"].astype(str),
+        "count": 1,
+        "wins": (pl > 0).astype(int),
+        "pnl": pl,
+    }).dropna(subset=["date"])
+    return b.groupby(["date","ticker"], as_index=False)[["count","wins","pnl"]].sum()
+
+def _trades_signature() -> list:
+    # partitionné: le manifeste est réécrit à chaque écriture de trades
+    stat = (_paths()["manifest"] if PARTITIONED else _paths()["trades"]).stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+def aggregates_fresh() -> bool:
+    """Les agrégats correspondent-ils au fichier trades actuel ?"""
+    try:
+        return json.loads(_paths()["agg_meta"].read_text())["source"] == _trades_signature()
+    except (OSError, ValueError, KeyError):
+        return False
+
+def _save_aggregates(agg: pd.DataFrame):
+    agg = agg[agg["count"] > 0].sort_values(["date","ticker"])
+    tmp = _paths()["agg"].with_name(_paths()["agg"].name + ".tmp")
+    agg.assign(date=pd.to_datetime(agg["date"]).dt.strftime("%Y-%m-%d")).to_csv(tmp, index=False)
+    os.replace(tmp, _paths()["agg"])
+    _atomic_write_text(_paths()["agg_meta"], json.dumps({"source": _trades_signature()}))
+    _read_aggregates_cached.clear()
+
+@traced("aggregate.rebuild")
+def rebuild_aggregates(df: pd.DataFrame | None = None):
+    """Recalcul complet (fichier absent, modifié à la main, ou réécriture totale)."""
+    if df is None:
+        df = load_trades(PROGRESS_COLUMNS)
+    _save_aggregates(_trade_buckets(df))
+
+@traced("aggregate.update")
+def update_aggregates(fresh: bool, added: pd.DataFrame | None = None, removed: pd.DataFrame | None = None):
+    """Applique un delta après une écriture. `fresh` = état AVANT l'écriture:
+    si les agrégats étaient déjà périmés, on reconstruit au lieu d'empiler."""
+    if not fresh:
+        rebuild_aggregates()
+        return
+    parts = [_load_aggregates_raw(), _trade_buckets(added)]
+    minus = _trade_buckets(removed)
+    minus[["count","wins","pnl"]] *= -1
+    parts.append(minus)
+    parts = [p for p in parts if not p.empty]
+    agg = (pd.concat(parts, ignore_index=True).groupby(["date","ticker"], as_index=False)[["count","wins","pnl"]].sum()
+           if parts else pd.DataFrame(columns=AGG_COLUMNS))
+    _save_aggregates(agg)
+
+@_memo(max_entries=4)
+def _read_aggregates_cached(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    agg = pd.read_csv(path, dtype={"ticker": str})
+    agg["date"] = pd.to_datetime(agg["date"])
+    return agg
+
+def _load_aggregates_raw() -> pd.DataFrame:
+    stat = _paths()["agg"].stat()
+    return _read_aggregates_cached(str(_paths()["agg"]), stat.st_mtime_ns, stat.st_size)
+
+def _ensure_aggregates():
+    ensure_datafiles()
+    if not _paths()["agg"].exists() or not aggregates_fresh():
+        with _write_lock():
+            rebuild_aggregates()
+
+def load_aggregates() -> pd.DataFrame:
+    _ensure_aggregates()
+    return _load_aggregates_raw()
+
+def aggregates_version() -> tuple:
+    """Version des agrégats (mtime, taille): change à chaque écriture de trades.
+    Sert de clé aux résultats calculés à partir d'eux (analytics)."""
+    _ensure_aggregates()
+    stat = _paths()["agg"].stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# ---------- Requêtes filtrées (poussées dans SQLite quand il est actif) ----------
+@_memo(max_entries=64)
+def _sql_query_cached(sql: str, params: tuple, mtime_ns: int, size: int) -> pd.DataFrame:
+    with _db() as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+def _sql_query(sql: str, params: list) -> pd.DataFrame:
+    ensure_datafiles()
+    stat = _paths()["db"].stat()
+    return _sql_query_cached(sql, tuple(params), stat.st_mtime_ns, stat.st_size)
+
+def _trade_filter_sql(start=None, end=None, tickers=None) -> tuple:
+    clauses, params = [], []
+    if start:
+        clauses.append("date >= ?"); params.append(start.isoformat())
+    if end:
+        clauses.append("date <= ?"); params.append(end.isoformat())
+    if tickers:
+        clauses.append(f"ticker IN ({','.join('?' * len(tickers))})"); params += list(tickers)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+@traced("filter.trades")
+def query_trades(start=None, end=None, tickers=None, columns: list | None = None,
+                 newest_first: bool = False, limit: int | None = None, offset: int = 0) -> pd.DataFrame:
+    """Trades entre start et end (inclus), limités à `tickers` si fourni.
+    `limit`/`offset` découpent le résultat en pages (LIMIT/OFFSET en SQL)."""
+    if STORAGE_ENGINE == "sqlite":
+        where, params = _trade_filter_sql(start, end, tickers)
+        order = "date DESC, time DESC" if newest_first else "rowid"
+        page = f" LIMIT {int(limit)} OFFSET {int(offset)}" if limit else ""
+        df = _sql_query(f"SELECT {','.join(stored_columns(columns) or TRADE_COLUMNS)} FROM trades{where} ORDER BY {order}{page}", params)
+        return coerce_trades_schema(df, columns)
+    # colonnes des filtres / du tri lues en plus d'une projection, retirées à la fin
+    used = (["date"] if start or end else []) + (["ticker"] if tickers else []) \
+        + (["timestamp"] if newest_first else [])
+    extra = [c for c in dict.fromkeys(used) if columns and c not in columns]
+    df = load_trades_between(start, end, list(columns) + extra if columns else None)
+    if not df.empty:
+        if start:   df = df[df["date"] >= pd.Timestamp(start)]  # datetime64: comparaison vectorisée
+        if end:     df = df[df["date"] <= pd.Timestamp(end)]
+        if tickers: df = df[df["ticker"].isin(tickers)]
+        if newest_first:
+            df = df.sort_values("timestamp", ascending=False, kind="stable")  # datetime64: tri natif
+        if limit:
+            df = df.iloc[offset:offset + limit]
+    return df.drop(columns=extra) if extra else df
+
+@traced("filter.daily")
+def query_daily(start=None, end=None) -> pd.DataFrame:
+    if STORAGE_ENGINE == "sqlite":
+        clauses, params = [], []
+        if start: clauses.append("date >= ?"); params.append(start.isoformat())
+        if end:   clauses.append("date <= ?"); params.append(end.isoformat())
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return coerce_daily_schema(_sql_query(f"SELECT * FROM daily{where}", params))
+    df = load_daily()
+    if not df.empty:
+        if start: df = df[df["date"] >= start]
+        if end:   df = df[df["date"] <= end]
+    return df
@@ -0,0 +1,129 @@
+# trace.py — chronométrage des étapes d'un rerun (sans Streamlit)
+# -----------------------------------------------------------
+# - span("load") : bloc chronométré, nommé "étape" ou "étape.détail"
+#   (load, coerce, save, filter, aggregate, render); les spans s'imbriquent
+#   et chacun garde son temps propre (hors spans enfants)
+# - begin() / end() encadrent un rerun; seuls les reruns tirés au sort
+#   (JOURNAL_TRACE_SAMPLE) sont mesurés. Hors mesure, un span coûte une
+#   lecture de ContextVar: l'instrumentation peut rester dans le code chaud
+# - les threads d'arrière-plan (préchauffage, compaction) héritent du
+#   contexte du rerun: ils entrent dans detached() et ne sont pas mesurés
+# - breakdown() : temps par étape; chrome_trace() : export JSON lisible
+#   dans Perfetto / chrome://tracing
+# -----------------------------------------------------------
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import random
+import time
+
+import pandas as pd
+
+TRACE_DEFAULT = os.environ.get("JOURNAL_TRACE", "off").lower() in ("1", "on", "true", "yes")
+TRACE_SAMPLE = float(os.environ.get("JOURNAL_TRACE_SAMPLE", "1.0"))  # part des reruns mesurés
+TRACE_KEEP = int(os.environ.get("JOURNAL_TRACE_KEEP", "50"))          # reruns gardés pour l'export
+
+_RUN = contextvars.ContextVar("trace_run", default=None)  # rerun mesuré en cours (ou None)
+_OFF = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("run", "name", "start", "children")
+
+    def __init__(self, run: dict, name: str):
+        self.run, self.name = run, name
+
+    def __enter__(self):
+        self.children = 0
+        self.run["stack"].append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter_ns() - self.start
+        stack = self.run["stack"]
+        stack.pop()
+        if stack:
+            stack[-1].children += dur
+        self.run["spans"].append({"name": self.name, "start_us": (self.start - self.run["t0"]) // 1000,
+                                  "us": dur // 1000, "self_us": (dur - self.children) // 1000,
+                                  "depth": len(stack)})
+        return False
+
+
+def span(name: str):
+    """with span("load"): ... — no-op si le rerun courant n'est pas mesuré."""
+    run = _RUN.get()
+    return _OFF if run is None else _Span(run, name)
+
+
+@contextlib.contextmanager
+def detached():
+    """Bloc hors mesure (cible d'un thread lancé avec copy_context: sans cela
+    il écrirait dans les spans du rerun, même après end())."""
+    token = _RUN.set(None)
+    try:
+        yield
+    finally:
+        _RUN.reset(token)
+
+
+def traced(name: str):
+    """Décorateur: toute la fonction dans un span `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _RUN.get() is None:
+                return fn(*args, **kwargs)
+            with _Span(_RUN.get(), name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def begin(enabled: bool = True, label: str = "", sample: float = TRACE_SAMPLE) -> dict | None:
+    """Début d'un rerun: mesuré si `enabled` et tiré au sort. À appeler à
+    chaque rerun (remet aussi à zéro un rerun interrompu par st.rerun)."""
+    run = None
+    if enabled and random.random() < sample:
+        run = {"label": label, "started": pd.Timestamp.now().isoformat(timespec="milliseconds"),
+               "t0": time.perf_counter_ns(), "spans": [], "stack": []}
+    _RUN.set(run)
+    return run
+
+
+def end(run: dict | None) -> dict | None:
+    """Fin du rerun: durée totale, spans triés par début. None si non mesuré."""
+    _RUN.set(None)
+    if run is None:
+        return None
+    run["total_us"] = (time.perf_counter_ns() - run.pop("t0")) // 1000
+    run.pop("stack")
+    run["spans"].sort(key=lambda s: s["start_us"])
+    return run
+
+
+def breakdown(run: dict) -> pd.DataFrame:
+    """Temps propre par étape ("load.csv" -> load) + "other" (hors spans)."""
+    spans = pd.DataFrame(run["spans"], columns=["name", "start_us", "us", "self_us", "depth"])
+    stages = spans.assign(stage=spans["name"].str.split(".").str[0])
+    out = stages.groupby("stage").agg(calls=("name", "size"), self_us=("self_us", "sum"))
+    out.loc["other"] = [0, max(0, run["total_us"] - int(spans["self_us"].sum()))]
+    out["ms"] = (out["self_us"] / 1000).round(2)
+    out["share"] = (out["self_us"] / max(1, run["total_us"]) * 100).round(1)
+    return out.drop(columns="self_us").sort_values("ms", ascending=False).reset_index()
+
+
+def chrome_trace(runs: list) -> bytes:
+    """Reruns -> JSON "Trace Event Format" (un rerun = une piste)."""
+    events = []
+    for tid, run in enumerate(runs, start=1):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                       "args": {"name": f"{run['started']} {run['label']}".strip()}})
+        events.append({"name": "rerun", "ph": "X", "pid": 1, "tid": tid, "ts": 0, "dur": run["total_us"]})
+        events += [{"name": s["name"], "cat": s["name"].split(".")[0], "ph": "X", "pid": 1, "tid": tid,
+                    "ts": s["start_us"], "dur": s["us"]} for s in run["spans"]]
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}).encode("utf-8")
@@ -0,0 +1,91 @@
+# trade_math.py — PnL / R:R / R-multiple sur des colonnes entières (NumPy)
+# -----------------------------------------------------------
+# Mêmes règles que les anciens compute_* de app_backup (un trade à la fois):
+# - side != "Long" => Short
+# - valeur manquante (None / NaN / 0 pour entry, stop, target) => 0.0
+# - risque <= 0 (stop du mauvais côté, stop = entry) => 0.0
+# - R-multiple: risk_ccy > 0 prioritaire, sinon |entry - stop| * qty
+# Tout est vectorisé: recalculer l'historique complet quand les frais ou
+# le risque changent prend quelques secondes même sur des millions de lignes.
+# -----------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+def _num(values) -> np.ndarray:
+    """Scalaire / liste / Series -> tableau float (None et texte -> NaN)."""
+    if values is None or np.isscalar(values):
+        values = [values]
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+def _direction(side) -> np.ndarray:
+    return np.where(np.asarray(side, dtype=object) == "Long", 1.0, -1.0)
+
+def _set(values) -> np.ndarray:
+    """Valeur renseignée (ni NaN ni 0), comme `if entry and stop ...`."""
+    return ~np.isnan(values) & (values != 0)
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """round(x, 2) de Python: np.round passe par x * 100 et tombe parfois de
+    l'autre côté sur les demis (0.005 -> 0.0 au lieu de 0.01). Ces cas-là,
+    rares, sont repris un par un avec round()."""
+    out = np.round(values, 2)
+    scaled = values * 100
+    tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if tie.any():
+        out[tie] = [round(float(v), 2) for v in values[tie]]
+    return out
+
+def _ratio(num: np.ndarray, den: np.ndarray, ok: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(num))
+    np.divide(num, den, out=out, where=ok)
+    return _round2(out)
+
+def pnl(side, entry, exit_, qty, fees=0.0) -> np.ndarray:
+    """direction * (exit - entry) * qty - fees ; 0.0 si qty/entry/exit manquent."""
+    entry, exit_, qty = _num(entry), _num(exit_), _num(qty)
+    fees = np.nan_to_num(np.broadcast_to(_num(fees), entry.shape))
+    ok = ~(np.isnan(entry) | np.isnan(exit_) | np.isnan(qty))
+    raw = _direction(side) * (exit_ - entry) * qty - fees
+    return np.where(ok, raw, 0.0)
+
+def _rr(side, entry, stop, level) -> np.ndarray:
+    entry, stop, level = _num(entry), _num(stop), _num(level)
+    d = _direction(side)
+    risk = d * (entry - stop)
+    reward = d * (level - entry)
+    ok = _set(entry) & _set(stop) & _set(level) & (entry > 0) & (risk > 0)
+    return _ratio(reward, risk, ok)
+
+def rr_planned(side, entry, stop, target) -> np.ndarray:
+    """R:R prévu = (target - entry) / (entry - stop), signes inversés en Short."""
+    return _rr(side, entry, stop, target)
+
+def rr_realized(side, entry, stop, exit_) -> np.ndarray:
+    """R:R réalisé: même formule avec la sortie réelle à la place du target."""
+    return _rr(side, entry, stop, exit_)
+
+def r_multiple(pnl_values, risk_ccy, qty, entry, stop) -> np.ndarray:
+    """PnL / risque initial ; risk_ccy > 0 prioritaire, sinon |entry - stop| * qty."""
+    pnl_values = np.nan_to_num(_num(pnl_values))
+    risk_ccy, qty, entry, stop = _num(risk_ccy), _num(qty), _num(entry), _num(stop)
+    risk_ccy = np.broadcast_to(risk_ccy, pnl_values.shape)
+    derived = np.where(_set(entry) & _set(stop) & (qty > 0), np.abs(entry - stop) * qty, 0.0)
+    denom = np.where(risk_ccy > 0, risk_ccy, derived)
+    return _ratio(pnl_values, denom, denom > 0)
+
+def recompute_trades(df: pd.DataFrame, fees=None, risk_ccy=None) -> pd.DataFrame:
+    """Recalcule pnl, rr_planned, rr_realized et r_multiple pour tout le journal.
+    `fees` / `risk_ccy` (scalaire ou colonne) remplacent les valeurs stockées,
+    pour rejouer l'historique avec d'autres paramètres de frais ou de risque."""
+    df = df.copy()
+    if df.empty:
+        return df
+    if fees is not None:     df["fees"] = np.broadcast_to(_num(fees), len(df))
+    if risk_ccy is not None: df["risk_ccy"] = np.broadcast_to(_num(risk_ccy), len(df))
+    col = lambda c: df[c] if c in df else np.full(len(df), np.nan)
+    df["pnl"] = pnl(col("side"), col("entry"), col("exit"), col("quantity"), col("fees"))
+    df["rr_planned"] = rr_planned(col("side"), col("entry"), col("stop"), col("target"))
+    df["rr_realized"] = rr_realized(col("side"), col("entry"), col("stop"), col("exit"))
+    df["r_multiple"] = r_multiple(df["pnl"], col("risk_ccy"), col("quantity"), col("entry"), col("stop"))
+    return df
@@ -0,0 +1,183 @@
+# wal.py — journal d'écriture anticipée (write-ahead log) d'un journal
+# -----------------------------------------------------------
+# Fichiers dans <journal>/wal/ (sans pandas ni Streamlit):
+# - <seq de départ>.log : segments JSON lines, un enregistrement par
+#   mutation ({"seq", "ts", "op", "table", "rows", "deleted"}), fsync à chaque ajout;
+#   {"op": "abort", "of": n} annule la mutation n (application en échec)
+# - checkpoint.json     : {"seq": n} -> tout ce qui est <= n est sur disque
+# - applied.json        : {"seq": n, "store": signature} -> tout ce qui est <= n
+#   est appliqué au stockage tant que ses fichiers ont cette signature
+#   (écrit sans fsync: perdu, il ne coûte qu'un rejeu depuis le checkpoint)
+# Un segment est fermé au checkpoint suivant; les derniers segments fermés
+# sont gardés pour les lecteurs en retard (index de recherche).
+# L'appelant tient le verrou d'écriture du journal (storage._write_lock).
+# -----------------------------------------------------------
+
+import json
+import os
+from pathlib import Path
+
+SEGMENT_SUFFIX = ".log"
+
+# dossier -> (segment, taille connue, dernier seq): évite de relire le segment
+# à chaque ajout tant qu'aucun autre process ne l'a modifié
+_TAILS = {}
+
+
+def _dir(root: Path) -> Path:
+    return Path(root) / "wal"
+
+
+def segments(root: Path) -> list:
+    """Segments du journal, du plus ancien au plus récent."""
+    d = _dir(root)
+    if not d.exists():
+        return []
+    return sorted(d.glob("*" + SEGMENT_SUFFIX), key=lambda p: int(p.stem))
+
+
+def closed_segments(root: Path) -> list:
+    """Segments entièrement couverts par le dernier checkpoint (immuables)."""
+    ckpt = checkpoint_seq(root)
+    segs = segments(root)
+    return [s for s, nxt in zip(segs, segs[1:] + [None])
+            if (int(nxt.stem) - 1 if nxt is not None else last_seq(root)) <= ckpt]
+
+
+def checkpoint_seq(root: Path) -> int:
+    try:
+        return int(json.loads((_dir(root) / "checkpoint.json").read_text())["seq"])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def applied(root: Path) -> dict:
+    try:
+        return json.loads((_dir(root) / "applied.json").read_text())
+    except (OSError, ValueError):
+        return {"seq": 0, "store": None}
+
+
+def mark_applied(root: Path, seq: int, store):
+    """Mémorise que les mutations <= `seq` sont appliquées au stockage, dont
+    les fichiers ont la signature `store` (liste JSON)."""
+    d = _dir(root)
+    d.mkdir(parents=True, exist_ok=True)
+    tmp = d / "applied.json.tmp"
+    tmp.write_text(json.dumps({"seq": seq, "store": store}))
+    os.replace(tmp, d / "applied.json")
+
+
+def committed(records: list) -> list:
+    """Enregistrements à rejouer / indexer: sans les aborts ni ce qu'ils annulent."""
+    aborted = {r["of"] for r in records if r["op"] == "abort"}
+    return [r for r in records if r["op"] != "abort" and r["seq"] not in aborted]
+
+
+def _read(path: Path) -> tuple:
+    """(enregistrements valides, octets valides). Une dernière ligne coupée
+    (arrêt brutal pendant un ajout) est ignorée."""
+    records, good = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            good += len(line)
+    return records, good
+
+
+def _tail(root: Path) -> tuple:
+    """(segment courant ou None, dernier seq écrit)."""
+    segs = segments(root)
+    if not segs:
+        return None, checkpoint_seq(root)
+    seg = segs[-1]
+    size = seg.stat().st_size
+    cached = _TAILS.get(str(_dir(root)))
+    if cached and cached[0] == seg and cached[1] == size:
+        return seg, cached[2]
+    records, good = _read(seg)
+    if good != size:  # ligne coupée: on la retire avant d'écrire derrière
+        with open(seg, "r+b") as f:
+            f.truncate(good)
+            os.fsync(f.fileno())
+    seq = records[-1]["seq"] if records else int(seg.stem) - 1
+    _TAILS[str(_dir(root))] = (seg, good, seq)
+    return seg, seq
+
+
+def last_seq(root: Path) -> int:
+    return _tail(root)[1]
+
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)  # scalaires numpy, dates
+
+
+def append(root: Path, record: dict) -> int:
+    """Ajoute `record` (+ seq) au segment courant, fsync, renvoie le seq."""
+    d = _dir(root)
+    d.mkdir(parents=True, exist_ok=True)
+    seg, seq = _tail(root)
+    seq += 1
+    if seg is None or int(seg.stem) <= checkpoint_seq(root):  # segment fermé: on en ouvre un
+        seg = d / f"{seq:012d}{SEGMENT_SUFFIX}"
+    line = (json.dumps({"seq": seq, **record}, default=_json_default, separators=(",", ":")) + "\n").encode("utf-8")
+    with open(seg, "ab") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    _TAILS[str(d)] = (seg, seg.stat().st_size, seq)
+    return seq
+
+
+def records_after(root: Path, seq: int) -> list:
+    """Enregistrements de seq > `seq`, dans l'ordre (rejeu au démarrage)."""
+    segs = segments(root)
+    out = []
+    for i, seg in enumerate(segs):
+        if i + 1 < len(segs) and int(segs[i + 1].stem) - 1 <= seq:
+            continue  # segment entièrement antérieur
+        out += [r for r in _read(seg)[0] if r["seq"] > seq]
+    return out
+
+
+def pending(root: Path) -> tuple:
+    """(nb d'enregistrements depuis le checkpoint, taille du segment courant)."""
+    seg, seq = _tail(root)
+    return seq - checkpoint_seq(root), (seg.stat().st_size if seg is not None else 0)
+
+
+def fsync_path(path: Path):
+    """Force un fichier (ou un dossier, hors Windows) sur le disque."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # dossiers sous Windows
+    finally:
+        os.close(fd)
+
+
+def mark_checkpoint(root: Path, seq: int, keep: int):
+    """Enregistre le checkpoint `seq` (le stockage doit déjà être sur disque)
+    puis ne garde que les `keep` derniers segments fermés."""
+    d = _dir(root)
+    d.mkdir(parents=True, exist_ok=True)
+    tmp = d / "checkpoint.json.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps({"seq": seq}))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, d / "checkpoint.json")
+    fsync_path(d)
+    closed = closed_segments(root)
+    for seg in closed[:max(0, len(closed) - keep)]:
+        seg.unlink(missing_ok=True)
@@ -0,0 +1,78 @@
+# warmup.py — préchauffage de la page Progress en arrière-plan
+# -----------------------------------------------------------
+# Après chaque écriture (save_*, change-sets, ajouts, import en masse dans
+# le même process), un thread recalcule la vue par défaut de Progress
+# (toute la période, toutes les paires): KPIs, equity, hebdo / mensuel,
+# métriques de risque, tables trades / notes. Les résultats vont dans les
+# caches de analytics.py / storage.py: la première visite après une édition
+# est servie à chaud, quelle que soit la taille de l'historique.
+# Le même worker met à jour l'index de recherche des notes (search.py).
+# Le préchauffage porte sur le journal qui vient d'être modifié.
+# JOURNAL_WARMUP=off désactive le préchauffage.
+# -----------------------------------------------------------
+
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import analytics, search, storage, trace
+
+WARMUP_ENABLED = os.environ.get("JOURNAL_WARMUP", "on").lower() not in ("off", "0", "false")
+
+# Un seul thread: les préchauffages s'exécutent l'un après l'autre, et une
+# rafale d'écritures sur un journal n'en empile qu'un (il lira l'état le
+# plus récent).
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-warmup")
+_STATE = {"lock": threading.Lock(), "queued": set(), "started": False}
+
+def warm_progress():
+    """Calcule (donc met en cache) la vue par défaut de la page Progress
+    du journal courant."""
+    with _STATE["lock"]:
+        _STATE["queued"].discard(storage.current_journal())
+    bounds = analytics.trade_kpis()
+    analytics.trade_tickers()
+    start, end = bounds["first"], bounds["last"]
+    if bounds["total"]:
+        analytics.trade_kpis(start, end)
+        analytics.progress_series(start, end)
+        analytics.risk_metrics(start, end)
+        storage.query_trades(start, end)
+    storage.load_daily()
+    if start:
+        storage.query_daily(start, end)
+
+def _run():
+    with trace.detached():  # contexte copié d'un rerun peut-être chronométré
+        try:
+            warm_progress()
+        except Exception:  # un échec de préchauffage ne doit jamais casser une écriture
+            logging.getLogger(__name__).exception("Progress warm-up failed")
+        try:
+            search.sync()
+        except Exception:
+            logging.getLogger(__name__).exception("Search index update failed")
+
+def schedule_warmup():
+    """Planifie un préchauffage (non bloquant, fusionne les demandes en attente)."""
+    if not WARMUP_ENABLED:
+        return
+    journal = storage.current_journal()
+    with _STATE["lock"]:
+        if journal in _STATE["queued"]:
+            return
+        _STATE["queued"].add(journal)
+    # copy_context: le worker préchauffe le journal de l'appelant
+    _EXECUTOR.submit(contextvars.copy_context().run, _run)
+
+def start_warmup():
+    """À appeler au démarrage du serveur: abonne le préchauffage aux écritures
+    et chauffe une première fois. Idempotent (Streamlit relance le script)."""
+    with _STATE["lock"]:
+        if _STATE["started"]:
+            return
+        _STATE["started"] = True
+    storage.add_write_listener(schedule_warmup)
+    schedule_warmup()